@@ -0,0 +1,376 @@
+# HTTP API for SkillSling AI
+# A thin alternative to the Streamlit app for phones and lightweight
+# clients: the same TutorEngine behind a small asyncio (Starlette/uvicorn)
+# server. Answers stream as server-sent events, so a client needs nothing
+# but fetch/EventSource, and one process holds hundreds of open streams –
+# the event loop only relays text, while each generating turn runs on a
+# worker thread (bounded by API_MAX_STREAMS) that hands its chunks to the
+# loop. Streams of disconnected clients are dropped at the next chunk, or
+# while still queued for a slot, which frees the slot for others.
+#
+#   python api_server.py --port 8600
+#
+#   POST /api/chat                      {"message", "session_id"?, "language"?, "subject"?, "model"?,
+#                                        "auto_model"?, "document"?, "direct_math"?} -> text/event-stream
+#   GET  /api/sessions/{id}/messages    conversation so far
+#   GET  /api/sessions/{id}/corrections answers fixed by the background checker
+#   POST /api/documents                 multipart "file" (PDF) -> {"key", "status", ...}
+#   GET  /api/documents/{key}           indexing progress
+#   GET  /api/health
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from backends import get_backends
+from model_router import AUTO_ROUTE, MODEL_PROFILES
+from pdf_index import start_indexing
+from script_guard import EXPECTED_SCRIPTS
+from tutor_engine import get_engine
+
+API_HOST = os.environ.get("SKILLSLING_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("SKILLSLING_API_PORT", "8600"))
+API_MAX_STREAMS = int(os.environ.get("SKILLSLING_API_MAX_STREAMS", "256"))   # turns generating at once
+DEFAULT_MODEL = os.environ.get("SKILLSLING_API_MODEL", "qwen2.5:7b-instruct-q4_K_M")
+SUBJECTS = ["General", "English", "Social Science", "Mathematics", "Science"]
+MAX_MESSAGE_CHARS = 4000
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+MAX_DOCUMENTS = 64         # indexed PDFs kept in memory, least recently used dropped
+MAX_SESSIONS = 2048        # conversations whose history is kept in memory, least recently used dropped
+HEARTBEAT_SECONDS = 15.0   # SSE comment sent while a stream is idle, so proxies keep it open
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def error(status, message):
+    return JSONResponse({"error": message}, status_code=status)
+
+
+class _Disconnected(Exception):
+    """Raised inside a queued turn once its client has gone"""
+
+
+class TutorAPI:
+    """Request handlers around the process-wide engine"""
+
+    def __init__(self, engine=None, max_streams=API_MAX_STREAMS):
+        self._engine = engine
+        self.pool = ThreadPoolExecutor(max_workers=max_streams, thread_name_prefix="api-turn")
+        self.documents = OrderedDict()   # index key -> (store, job, meta); job is None when loaded from cache
+        self._documents_lock = threading.Lock()
+        self.sessions = OrderedDict()    # session id -> messages, so chats don't read the database
+        self._sessions_lock = threading.Lock()
+        self.streams = 0
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            self._engine = get_engine()
+        return self._engine
+
+    def routes(self):
+        return [
+            Route("/api/health", self.health),
+            Route("/api/chat", self.chat, methods=["POST"]),
+            Route("/api/sessions/{session_id}/messages", self.messages),
+            Route("/api/sessions/{session_id}/corrections", self.corrections),
+            Route("/api/documents", self.upload, methods=["POST"]),
+            Route("/api/documents/{key}", self.document),
+        ]
+
+    # ---- chat ----
+
+    async def chat(self, request):
+        try:
+            body = await request.json()
+        except ValueError:
+            return error(400, "body must be JSON")
+        if not isinstance(body, dict):
+            return error(400, "body must be a JSON object")
+        message = str(body.get("message") or "").strip()
+        if not message:
+            return error(400, "message is required")
+        if len(message) > MAX_MESSAGE_CHARS:
+            return error(413, f"message is longer than {MAX_MESSAGE_CHARS} characters")
+        language = body.get("language", "English")
+        subject = body.get("subject", "General")
+        if language not in EXPECTED_SCRIPTS:
+            return error(400, f"language must be one of {', '.join(EXPECTED_SCRIPTS)}")
+        if subject not in SUBJECTS:
+            return error(400, f"subject must be one of {', '.join(SUBJECTS)}")
+        store = None
+        if body.get("document"):
+            with self._documents_lock:
+                entry = self.documents.get(body["document"])
+            if entry is None:
+                return error(404, "unknown document, upload it again")
+            store = entry[0]
+        session_id = str(body.get("session_id") or uuid.uuid4())
+        model = str(body.get("model") or DEFAULT_MODEL)
+        auto_models = None
+        if body.get("auto_model", AUTO_ROUTE):
+            installed = await run_in_threadpool(get_backends().installed_models)
+            auto_models = [m for m in MODEL_PROFILES if m in installed]
+
+        history = self._cached_history(session_id)
+        if history is None:
+            history = await run_in_threadpool(self._load_history, session_id)
+        stream = self._stream(session_id, message, history, language, subject, model, store,
+                              body.get("direct_math"), auto_models)
+        return StreamingResponse(stream, media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no",
+                                          "X-Session-Id": session_id})
+
+    async def _stream(self, session_id, message, history, language, subject, model, store, direct_math,
+                      auto_models):
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+        gone = threading.Event()
+
+        def put(kind, value=None):
+            loop.call_soon_threadsafe(events.put_nowait, (kind, value))
+
+        last_position = [None]
+
+        def on_wait(position):
+            if gone.is_set():
+                raise _Disconnected()
+            if position != last_position[0]:
+                last_position[0] = position
+                put("wait", position)
+
+        # Routing may probe the fact DB, so off the event loop as well
+        turn = await run_in_threadpool(
+            self.engine.ask, session_id, message, history, language, subject, model, vector_store=store,
+            on_wait=on_wait, direct_math=direct_math, auto_models=auto_models,
+        )
+        self._remember(session_id, {"role": "user", "content": message})
+
+        def generate():
+            texts = iter(turn)
+            try:
+                for text in texts:
+                    if gone.is_set():
+                        texts.close()   # releases the slot and the backend stream
+                        return
+                    put("token", text)
+                self._remember(session_id, {"role": "assistant", "id": turn.id, "content": turn.answer,
+                                            "latency": turn.metrics["latency"]})
+                put("done")
+            except _Disconnected:
+                pass
+            except Exception as e:
+                put("error", str(e))
+
+        self.streams += 1
+        try:
+            yield sse("meta", {"session_id": session_id, "id": turn.id, "model": turn.model})
+            self.pool.submit(generate)
+            held = None
+            while True:
+                if held is not None:
+                    (kind, value), held = held, None
+                else:
+                    try:
+                        kind, value = await asyncio.wait_for(events.get(), HEARTBEAT_SECONDS)
+                    except asyncio.TimeoutError:
+                        yield ": keep-alive\n\n"
+                        continue
+                if kind == "token":
+                    # Everything that arrived meanwhile goes out as one event,
+                    # so slow clients get fewer, larger writes
+                    parts = [value]
+                    while not events.empty():
+                        item = events.get_nowait()
+                        if item[0] != "token":
+                            held = item
+                            break
+                        parts.append(item[1])
+                    yield sse("token", {"text": "".join(parts)})
+                elif kind == "wait":
+                    yield sse("wait", {"position": value})
+                elif kind == "error":
+                    yield sse("error", {"error": value})
+                    return
+                else:
+                    yield sse("done", self._summary(turn))
+                    return
+        finally:
+            # Client gone (or stream finished): stop the worker at its next step
+            gone.set()
+            self.streams -= 1
+
+    def _summary(self, turn):
+        metrics = turn.metrics
+        return {
+            "id": turn.id,
+            "answer": turn.answer,
+            "answered_by": turn.answered_by,
+            "latency": metrics["latency"],
+            "ttft": metrics["ttft"],
+            "tokens_per_sec": metrics["tokens_per_sec"],
+            "queue_wait": turn.queue_wait,
+            "cached": turn.cache_kind,
+            "direct": turn.direct,
+            "retries": turn.retries,
+            "route": turn.route.band if turn.route else None,
+            "notes_used": bool(turn.context),
+            "verifying": self.engine.verifying(turn.session_id),
+        }
+
+    # ---- sessions ----
+
+    def _cached_history(self, session_id):
+        with self._sessions_lock:
+            messages = self.sessions.get(session_id)
+            if messages is None:
+                return None
+            self.sessions.move_to_end(session_id)
+            return list(messages)
+
+    def _load_history(self, session_id):
+        """History of a session not in memory, e.g. after a restart.
+
+        Reads committed rows only: a flushing read would wait for the
+        pending writes of every open stream in the process.
+        """
+        history = self.engine.history
+        messages = history.load_session(session_id, flush=False) if history is not None else []
+        with self._sessions_lock:
+            messages = self.sessions.setdefault(session_id, messages)
+            self.sessions.move_to_end(session_id)
+            while len(self.sessions) > MAX_SESSIONS:
+                self.sessions.popitem(last=False)
+            return list(messages)
+
+    def _remember(self, session_id, message):
+        with self._sessions_lock:
+            self.sessions.setdefault(session_id, []).append(message)
+
+    async def messages(self, request):
+        session_id = request.path_params["session_id"]
+        messages = self._cached_history(session_id)
+        if messages is None:
+            messages = await run_in_threadpool(self._load_history, session_id)
+        return JSONResponse({"session_id": session_id, "messages": messages})
+
+    async def corrections(self, request):
+        session_id = request.path_params["session_id"]
+        engine = self.engine
+        # Applying a correction writes the answer cache (an embedding call), so off the event loop
+        results = await run_in_threadpool(engine.corrections, session_id)
+        with self._sessions_lock:
+            for message in self.sessions.get(session_id, []):
+                for turn_id, corrected in results:
+                    if message.get("id") == turn_id:
+                        message["content"] = corrected
+        return JSONResponse({
+            "verifying": engine.verifying(session_id),
+            "corrections": [{"id": turn_id, "content": corrected} for turn_id, corrected in results],
+        })
+
+    # ---- documents ----
+
+    async def upload(self, request):
+        too_large = error(413, f"PDFs up to {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+        if int(request.headers.get("content-length") or 0) > MAX_UPLOAD_BYTES:
+            return too_large
+        form = await request.form(max_files=1)
+        try:
+            upload = form.get("file")
+            if upload is None or not hasattr(upload, "read"):
+                return error(400, "multipart field 'file' with a PDF is required")
+            # The header may be missing (chunked) or wrong, so count what is actually read
+            parts, size = [], 0
+            while chunk := await upload.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    return too_large
+                parts.append(chunk)
+            pdf_bytes = b"".join(parts)
+        finally:
+            await form.close()
+        if not pdf_bytes.startswith(b"%PDF"):
+            return error(415, "not a PDF")
+        # Cache lookups load faiss; new PDFs index on the job's own thread
+        store, meta, job = await run_in_threadpool(start_indexing, pdf_bytes)
+        key = job.key if job else meta["key"]
+        with self._documents_lock:
+            self.documents[key] = (store, job, meta)
+            self.documents.move_to_end(key)
+            while len(self.documents) > MAX_DOCUMENTS:
+                self.documents.popitem(last=False)
+        return JSONResponse(self._document_status(key, job, meta))
+
+    async def document(self, request):
+        key = request.path_params["key"]
+        with self._documents_lock:
+            entry = self.documents.get(key)
+            if entry is not None:
+                self.documents.move_to_end(key)
+        if entry is None:
+            return error(404, "unknown document")
+        _, job, meta = entry
+        return JSONResponse(self._document_status(key, job, meta))
+
+    def _document_status(self, key, job, meta):
+        if job is None:
+            return {"key": key, "status": "ready", "pages": meta["pages"], "chunks": meta["chunks"], "cached": True}
+        if not job.done.is_set():
+            # Already indexed pages are searchable, so chat can use the key right away
+            return {"key": key, "status": "indexing", "pages_done": job.pages_done, "pages": job.total_pages,
+                    "chunks": job.chunks_done, "chunks_per_sec": job.chunks_per_sec}
+        if job.error:
+            return {"key": key, "status": "error", "error": str(job.error)}
+        return {"key": key, "status": "ready", "pages": job.meta["pages"], "chunks": job.meta["chunks"], "cached": False}
+
+    # ---- health ----
+
+    async def health(self, request):
+        backends = get_backends()
+        ok = await run_in_threadpool(backends.healthy)
+        installed = await run_in_threadpool(backends.installed_models)
+        return JSONResponse({
+            "ok": ok,
+            "models": sorted(installed),
+            "default_model": DEFAULT_MODEL,
+            "streams": self.streams,
+            "queue": self.engine.scheduler.stats(),
+        })
+
+
+def create_app(engine=None, max_streams=API_MAX_STREAMS):
+    api = TutorAPI(engine, max_streams)
+    app = Starlette(routes=api.routes())
+    app.state.api = api
+    return app
+
+
+app = create_app()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the SkillSling tutor over HTTP (SSE streaming)")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--max-streams", type=int, default=API_MAX_STREAMS, help="turns generating at once")
+    args = parser.parse_args(argv)
+    import uvicorn
+    # One process: the engine, scheduler and caches are per process
+    uvicorn.run(create_app(max_streams=args.max_streams), host=args.host, port=args.port,
+                timeout_keep_alive=30, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,14 @@
 import streamlit as st
-import ollama
-import time
-import tempfile
-import os
-import threading
-import sympy as sp
-from datetime import datetime
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_ollama import OllamaEmbeddings
-from langchain_community.vectorstores import FAISS
+import uuid
+from backends import get_backends
+from chat_history import get_history_store
+from math_engine import MATH_DIRECT_ANSWER, warm_up as warm_up_math
+from model_router import AUTO_ROUTE
+from model_warmup import model_status, last_load_seconds, preload, warm_up
+from pdf_index import EMBEDDING_MODEL, index_cache_key, start_indexing
+from quiz_bank import get_quiz_bank
+from stream_renderer import StreamRenderer, device_class
+from tutor_engine import get_engine
 
 # ==================== CONFIG ====================
 AVAILABLE_MODELS = [
@@ -36,56 +35,6 @@ PLACEHOLDERS = {
     "Telugu": "మీ ప్రశ్నను ఇక్కడ టైప్ చేయండి..."
 }
 
-LANGUAGE_SYSTEM_PROMPTS = {
-    "Hindi": """You are a Hindi tutor. Answer ONLY in Hindi (Devanagari script). No English letters at all. Use simple language. Follow NCERT style.""",
-    "English": """You are a helpful tutor for Indian students. Answer ONLY in English. Use clear, simple words. Be accurate and encouraging. Follow NCERT guidelines.""",
-    "Hinglish": """You are a Hinglish tutor (Roman script only). Mix Hindi + English naturally. Keep it simple and friendly.""",
-    "Tamil": """நீங்கள் தமிழ் ஆசிரியர். தமிழில் மட்டுமே பதிலளிக்கவும். எளிய மொழியைப் பயன்படுத்தவும்.""",
-    "Telugu": """మీరు తెలుగు ఉపాధ్యాయులు. తెలుగులో మాత్రమే సమాధానం ఇవ్వండి. సులభమైన భాష వాడండి."""
-}
-
-# Depth instructions per subject
-DEPTH_INSTRUCTIONS = {
-    "General": """
-Always structure answers like a patient, expert tutor:
-1. Short friendly intro
-2. Numbered / bulleted main points
-3. Simple examples
-4. Key takeaway + encouragement
-""",
-    "Science": """
-Include:
-• Exact cellular location
-• Key enzymes with full names
-• Balanced chemical equations
-• ATP/NADPH/electron counts
-• Related concepts (photorespiration etc.)
-End with boxed key takeaway **\\boxed{Key Takeaway: ...}**
-""",
-    "Mathematics": """
-STRICT MATH MODE:
-1. Restate problem
-2. Main formula/theorem
-3. Step-by-step numbered solution
-4. Algebraic details
-5. Box final answer **\\boxed{answer}**
-6. Re-check / substitute
-7. Common mistakes to avoid
-"""
-}
-
-# Verified fact database (expand later)
-FACT_DB = {
-    "indian independence": "15 August 1947",
-    "french revolution": "1789",
-    "non cooperation movement": "1920",
-    "quit india movement": "1942",
-    "first battle of panipat": "1526",
-    "battle of plassey": "1757",
-    "revolt of 1857": "1857",
-    "world war ii end": "1945",
-}
-
 # ==================== PAGE CONFIG & STYLE ====================
 st.set_page_config(page_title="SkillSling • AMD Slingshot", page_icon="🚀", layout="wide", initial_sidebar_state="collapsed")
 
@@ -123,26 +72,76 @@ defaults = {
     "language": "English",
     "model": "qwen2.5:7b-instruct-q4_K_M",
     "vector_store": None,
+    "pdf_key": None,
+    "index_job": None,
+    "pdf_status": None,
     "total_inference_time": 0.0,
     "query_count": 0,
+    "direct_math": MATH_DIRECT_ANSWER,
+    "auto_model": AUTO_ROUTE,
     "language_change_counter": 0,
-    "last_verified": None
+    "last_verified": None,
+    "quiz": None,
+    "quiz_seen": []
 }
 for k, v in defaults.items():
     if k not in st.session_state:
         st.session_state[k] = v
 
+# Phones get fewer, larger redraws while an answer streams
+if "device" not in st.session_state:
+    st.session_state.device = device_class(st.context.headers.get("User-Agent"))
+
+# Restore history for this session (?sid= in the URL survives reloads)
+if "session_id" not in st.session_state:
+    sid = st.query_params.get("sid") or str(uuid.uuid4())
+    st.session_state.session_id = sid
+    st.query_params["sid"] = sid
+    st.session_state.messages = get_history_store().load_session(sid)
+
+# Built once per process; reruns only redo the UI
+engine = get_engine()
+
 # ==================== SIDEBAR ====================
+@st.fragment(run_every=1.0)
+def model_loading():
+    """Poll a background model load; a full rerun shows the final state"""
+    if model_status(st.session_state.model) != "loading":
+        st.rerun()
+    st.caption(f"⏳ Loading **{st.session_state.model}** into memory...")
+
+
+@st.fragment(run_every=1.0)
+def indexing_progress():
+    """Poll the background PDF indexing job; the store is searchable while this runs"""
+    job = st.session_state.index_job
+    if job.done.is_set():
+        st.session_state.index_job = None
+        if job.error:
+            # Keep pdf_key so the same upload isn't retried on every rerun
+            st.session_state.vector_store = None
+            st.session_state.pdf_status = ("error", f"Indexing failed: {job.error}")
+        else:
+            st.session_state.pdf_status = ("success", f"PDF indexed ({job.meta['pages']} pages, {job.meta['chunks']} chunks • {job.meta['chunks_per_sec']} chunks/s)")
+        st.rerun()
+    st.progress(job.pages_done / max(job.total_pages, 1), text=f"Indexing page {job.pages_done}/{job.total_pages or '?'} • {job.chunks_per_sec} chunks/s")
+    if job.chunks_done:
+        st.caption("Already indexed pages are searchable")
+
 with st.sidebar:
     st.markdown("<div style='text-align:center; margin:20px 0;'><h2 style='color:#ed1c24;'>SKILLSLING</h2><div class='amd-badge'>AMD SLINGSHOT 2026</div></div>", unsafe_allow_html=True)
     st.markdown("<div class='amd-badge' style='margin:12px 0;'>Offline • AMD Powered</div>", unsafe_allow_html=True)
 
-    try:
-        ollama.list()
+    # Cached for a few seconds so reruns don't each hit the server
+    backends = get_backends()
+    if backends.healthy():
         st.success("Ollama Running", icon="✅")
-    except:
+    else:
         st.error("Ollama not running", icon="❌")
         st.caption("Run: `ollama serve`")
+    for name, server in backends.servers.items():
+        if name != "ollama":
+            st.caption(f"{'🟢' if backends.healthy(name) else '🔴'} {name} ({server.flavor})")
 
     st.markdown("---")
 
@@ -163,29 +162,104 @@ with st.sidebar:
             st.session_state.model = rec
             st.toast(f"Optimized model for {st.session_state.subject}", icon="🔧")
 
+    if st.session_state.subject == "Mathematics":
+        warm_up_math()
+        st.session_state.direct_math = st.toggle(
+            "⚡ Instant exact answers", value=st.session_state.direct_math,
+            help="Solvable integrals, derivatives, equations and limits are answered by SymPy without the AI explanation",
+        )
+
     st.subheader("AI Model")
     st.session_state.model = st.selectbox("", AVAILABLE_MODELS, index=AVAILABLE_MODELS.index(st.session_state.model) if st.session_state.model in AVAILABLE_MODELS else 0, label_visibility="collapsed")
 
-    st.caption(f"🧠 Active: **{st.session_state.model}** • Optimized for **{st.session_state.subject}**")
+    st.session_state.auto_model = st.toggle(
+        "🤖 Auto-pick model per question", value=st.session_state.auto_model,
+        help="Easy questions go to a small, fast model and hard ones to a stronger one; the router learns from answer times and checker results",
+    )
+    # Only models that can answer right now; with none, the selected model answers
+    auto_models = [m for m in AVAILABLE_MODELS if m in backends.installed_models()] if st.session_state.auto_model else []
+    if len(auto_models) > 1:
+        st.caption(f"🤖 Choosing between {len(auto_models)} installed models")
+
+    runtime = backends.name_for(st.session_state.model)
+    st.caption(f"🧠 Active: **{st.session_state.model}**" + (f" on {runtime}" if runtime != "ollama" else "")
+               + f" • Optimized for **{st.session_state.subject}**")
+
+    # Load a newly selected model right away instead of inside the first answer
+    if st.session_state.get("warmed_model") != st.session_state.model:
+        st.session_state.warmed_model = st.session_state.model
+        warm_up(st.session_state.model)
+    preload([st.session_state.model] + list(SUBJECT_MODEL_RECOMMENDATIONS.values()))
+    status = model_status(st.session_state.model)
+    if status == "loading":
+        model_loading()
+    elif status == "ready":
+        seconds = last_load_seconds(st.session_state.model)
+        st.caption("🟢 Model loaded" + (f" in {seconds:.1f}s" if seconds else ""))
+    elif status == "error":
+        st.caption("⚠️ Model failed to load – is it pulled? `ollama pull " + st.session_state.model + "`")
 
     st.subheader("Study Material")
     pdf = st.file_uploader("Upload PDF notes", type="pdf")
     if pdf:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tf:
-            tf.write(pdf.read())
-            path = tf.name
-        with st.spinner("Indexing PDF..."):
-            loader = PyPDFLoader(path)
-            docs = loader.load()
-            chunks = RecursiveCharacterTextSplitter(chunk_size=600, chunk_overlap=120).split_documents(docs)
-            st.session_state.vector_store = FAISS.from_documents(chunks, OllamaEmbeddings(model=st.session_state.model))
-            st.success(f"PDF indexed ({len(docs)} pages)")
-        os.unlink(path)
+        pdf_bytes = pdf.getvalue()
+        key = index_cache_key(pdf_bytes, EMBEDDING_MODEL)
+        # Reruns with the same file still in the uploader skip indexing entirely
+        if key != st.session_state.pdf_key:
+            store, meta, job = start_indexing(pdf_bytes)
+            st.session_state.vector_store = store
+            st.session_state.index_job = job
+            st.session_state.pdf_key = key
+            st.session_state.pdf_status = ("success", f"PDF loaded from cache ({meta['pages']} pages)") if meta else None
+
+    if st.session_state.index_job is not None:
+        indexing_progress()
+    elif st.session_state.pdf_status:
+        kind, text = st.session_state.pdf_status
+        (st.error if kind == "error" else st.success)(text)
+
+    st.markdown("---")
+    st.subheader("Interactive Study")
+    # Quizzes come from a pre-generated bank; notes get their own bank once indexed
+    bank = get_quiz_bank()
+    notes_ready = st.session_state.vector_store is not None and st.session_state.index_job is None
+    quiz_source = st.session_state.pdf_key if notes_ready else ""
+    subject, language = st.session_state.subject, st.session_state.language
+    if st.session_state.get("quiz_bank_key") != (subject, language, quiz_source):
+        st.session_state.quiz_bank_key = (subject, language, quiz_source)
+        bank.ensure(subject, language, st.session_state.model)
+        if notes_ready:
+            bank.ensure(subject, language, st.session_state.model, quiz_source, st.session_state.vector_store)
+    if st.button("📝 Test My Knowledge", use_container_width=True):
+        seen = st.session_state.quiz_seen
+        quiz = ((quiz_source and bank.sample(subject, language, quiz_source, exclude=seen))
+                or bank.sample(subject, language, exclude=seen)
+                or bank.sample(subject, language))   # everything seen: allow repeats
+        if quiz:
+            st.session_state.quiz = quiz
+            st.session_state.quiz_seen = seen + [q["id"] for q in quiz]
+        else:
+            bank.ensure(subject, language, st.session_state.model)
+            st.toast("Preparing quiz questions – try again in a moment", icon="⏳")
+    if bank.filling(subject, language) or (quiz_source and bank.filling(subject, language, quiz_source)):
+        st.caption("📝 Preparing more quiz questions...")
+
+    cache = engine.cache
+    if sum(cache.stats.values()):
+        st.caption(f"♻️ Answer cache hit rate: {cache.hit_rate:.0%} ({cache.stats['exact_hits']} exact, {cache.stats['semantic_hits']} similar)")
+
+    queue = engine.scheduler.stats()
+    if queue["queued"] or queue["interactive_wait_p95"] >= 0.5:
+        st.caption(f"👥 {queue['in_flight']} answering • {queue['queued']} waiting • p95 wait {queue['interactive_wait_p95']:.1f}s")
 
     st.markdown("---")
     if st.button("🗑️ Clear Chat", use_container_width=True):
         st.session_state.messages = []
         st.session_state.total_inference_time = st.session_state.query_count = 0
+        st.session_state.quiz = None
+        # Old turns stay in the database under the previous session id
+        st.session_state.session_id = str(uuid.uuid4())
+        st.query_params["sid"] = st.session_state.session_id
         st.rerun()
 
 # ==================== MAIN CHAT LOGIC ====================
@@ -200,13 +274,66 @@ if not st.session_state.messages:
     </div>
     """, unsafe_allow_html=True)
 
+# Apply corrections handed back by the background verifier
+for turn_id, corrected in engine.corrections(st.session_state.session_id):
+    for msg in st.session_state.messages:
+        if msg.get("id") == turn_id:
+            msg["content"] = corrected
+            msg["verified"] = True
+            st.session_state.last_verified = corrected
+
 for msg in st.session_state.messages:
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
         if "latency" in msg:
-            st.markdown(f'<div class="model-info">⚡ {msg["latency"]:.1f}s</div>', unsafe_allow_html=True)
+            note = " • ✔️ corrected by checker" if msg.get("verified") else ""
+            st.markdown(f'<div class="model-info">⚡ {msg["latency"]:.1f}s{note}</div>', unsafe_allow_html=True)
+
+
+def show_quiz(quiz):
+    with st.container(border=True):
+        st.markdown("#### 📝 Test My Knowledge")
+        with st.form("quiz_form"):
+            picks = [st.radio(f"**{i}.** {q['question']}", q["options"], index=None, key=f"quiz_{q['id']}")
+                     for i, q in enumerate(quiz, 1)]
+            checked = st.form_submit_button("Check answers")
+        if checked:
+            score = sum(pick == q["options"][q["answer"]] for pick, q in zip(picks, quiz))
+            st.markdown(f"**Score: {score}/{len(quiz)}**")
+            for i, (pick, q) in enumerate(zip(picks, quiz), 1):
+                right = q["options"][q["answer"]]
+                note = f" – {q['explanation']}" if q["explanation"] else ""
+                st.markdown(f"{'✅' if pick == right else '❌'} **{i}.** {right}{note}")
+        if st.button("Close quiz"):
+            st.session_state.quiz = None
+            st.rerun()
+
+
+if st.session_state.quiz:
+    show_quiz(st.session_state.quiz)
+
+
+@st.fragment(run_every=2.0)
+def verification_watch():
+    """Rerun once the background check of the last answer finishes"""
+    if not engine.verifying(st.session_state.session_id):
+        st.rerun()
+    st.caption("🔍 Double-checking the last answer...")
+
+
+watching_verification = engine.verifying(st.session_state.session_id)
+if watching_verification:
+    verification_watch()
 
 if prompt := st.chat_input(PLACEHOLDERS.get(st.session_state.language, "Ask anything...")):
+    turn = engine.ask(
+        st.session_state.session_id, prompt, st.session_state.messages,
+        st.session_state.language, st.session_state.subject, st.session_state.model,
+        vector_store=st.session_state.vector_store,
+        direct_math=st.session_state.direct_math,
+        auto_models=auto_models,
+        on_wait=lambda pos: placeholder.markdown(f"⏳ Tutor is busy – {pos} question(s) ahead of you..."),
+    )
     st.session_state.messages.append({"role": "user", "content": prompt})
     with st.chat_message("user"):
         st.markdown(prompt)
@@ -214,104 +341,42 @@ if prompt := st.chat_input(PLACEHOLDERS.get(st.session_state.language, "Ask anyt
     with st.chat_message("assistant"):
         placeholder = st.empty()
         placeholder.markdown(f"**Thinking in {st.session_state.language}...**")
-        full_response = ""
-
-        base = LANGUAGE_SYSTEM_PROMPTS.get(st.session_state.language, LANGUAGE_SYSTEM_PROMPTS["English"])
-        if st.session_state.subject in DEPTH_INSTRUCTIONS:
-            base += DEPTH_INSTRUCTIONS[st.session_state.subject]
-
-        system = base + f"\nCurrent subject focus: {st.session_state.subject}"
-
-        recent = st.session_state.messages[-5:]
-        msgs = [{"role": "system", "content": system}]
-        if len(st.session_state.messages) <= 2:
-            msgs.append({"role": "user", "content": f"From now on answer ONLY in {st.session_state.language} language."})
-        for m in recent:
-            msgs.append({"role": m["role"], "content": m["content"]})
-
-        start = time.time()
-
         try:
-            answer_content = None
-
-            # ── Hybrid engines ────────────────────────────────
-            prompt_lower = prompt.lower()
-
-            # 1. Mathematics – sympy first
-            if st.session_state.subject == "Mathematics":
-                try:
-                    x = sp.symbols('x')
-                    if any(word in prompt_lower for word in ["integrate", "∫", "dx"]):
-                        # Crude parse – improve later with better NLP
-                        expr_part = prompt_lower.split("integrate")[-1].strip().replace("from", "").replace("to", "").replace("dx", "").strip()
-                        expr = sp.sympify(expr_part)
-                        result = sp.integrate(expr, x)
-                        answer_content = f"The integral evaluates to **\\boxed{{{result}}}**.\n\nLet me explain step-by-step..."
-                except:
-                    pass
-
-            # 2. History / Social Science – fact DB first
-            if st.session_state.subject in ["Social Science", "General"]:
-                for key, value in FACT_DB.items():
-                    if key in prompt_lower:
-                        answer_content = f"{key.title()} occurred in **{value}**.\n\nLet me explain in detail..."
-                        break
-
-            # If hybrid handler found → elaborate with LLM
-            if answer_content is not None:
-                elaboration_msgs = msgs + [{"role": "user", "content": f"Elaborate on this fact/result in detail: {answer_content}"}]
-                stream = ollama.chat(
-                    model=st.session_state.model,
-                    messages=elaboration_msgs,
-                    stream=True,
-                    options={"temperature": 0.0, "top_p": 0.6, "top_k": 30, "repeat_penalty": 1.15, "num_predict": 1024}
-                )
-            else:
-                # Normal LLM path
-                stream = ollama.chat(
-                    model=st.session_state.model,
-                    messages=msgs,
-                    stream=True,
-                    options={"temperature": 0.0, "top_p": 0.6, "top_k": 30, "repeat_penalty": 1.15, "num_predict": 1024}
-                )
-
-            for chunk in stream:
-                if 'message' in chunk and 'content' in chunk['message']:
-                    full_response += chunk['message']['content']
-                    placeholder.markdown(full_response + "▌")
-
-            answer_content = full_response
-
-            placeholder.markdown(answer_content)
-
-            # Background verification
-            def background_verification():
-                try:
-                    check = f"""Strict checker. If any error, output corrected answer. If correct, output exactly the same. No explanation.
-
-Answer:
-{answer_content}"""
-                    verification = ollama.chat(
-                        model=st.session_state.model,
-                        messages=[{"role": "user", "content": check}],
-                        options={"temperature": 0.0, "top_p": 0.6, "num_predict": 1024}
-                    )
-                    corrected = verification['message']['content'].strip()
-                    if corrected != answer_content:
-                        st.session_state.last_verified = corrected
-                        placeholder.markdown(corrected)
-                except:
-                    pass
-
-            threading.Thread(target=background_verification, daemon=True).start()
-
-            latency = time.time() - start
-            st.markdown(f'<div class="model-info">⚡ {latency:.1f}s • {st.session_state.model}</div>', unsafe_allow_html=True)
+            renderer = StreamRenderer(placeholder, st.session_state.device)
+            for text in turn:
+                renderer.write(text)
+            renderer.finish(turn.answer)
+
+            if not watching_verification and engine.verifying(st.session_state.session_id):
+                verification_watch()
+
+            metrics = turn.metrics
+            latency = metrics["latency"]
+            info = f"⚡ {latency:.1f}s • {turn.answered_by}"
+            if metrics["ttft"] is not None and not turn.cache_kind and not turn.direct:
+                info += f" • first token {metrics['ttft']:.1f}s"
+            if metrics["tokens_per_sec"]:
+                info += f" • {metrics['tokens_per_sec']:.0f} tok/s"
+            if turn.route:
+                info += f" • 🤖 auto ({turn.route.band})"
+            if turn.cache_kind:
+                info += f" • ♻️ cached ({turn.cache_kind})"
+            if turn.direct:
+                info += " • 🧮 solved exactly"
+            if turn.retries:
+                info += f" • 🔁 restarted in {st.session_state.language}"
+            if turn.queue_wait >= 0.1:
+                info += f" • ⏳ queued {turn.queue_wait:.1f}s"
+            if turn.context:
+                info += f" • 🔎 notes {turn.retrieval_latency * 1000:.0f}ms"
+            st.markdown(f'<div class="model-info">{info}</div>', unsafe_allow_html=True)
 
             st.session_state.messages.append({
                 "role": "assistant",
-                "content": answer_content,
-                "latency": latency
+                "id": turn.id,
+                "content": turn.answer,
+                "latency": latency,
+                "metrics": metrics
             })
             st.session_state.total_inference_time += latency
             st.session_state.query_count += 1
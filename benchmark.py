@@ -0,0 +1,512 @@
+# Offline benchmark for the SkillSling AI chat pipeline
+# Drives the same TutorEngine as app.py (prompt building, hybrid engines,
+# scheduler and streaming loop) with simulated students, against a
+# fake Ollama server with configurable speeds or against the real backends
+# (Ollama and any servers configured in SKILLSLING_BACKENDS).
+#
+#   python benchmark.py                          # fake server, 1/4/16 students
+#   python benchmark.py --token-rate 8 --parallel 1 --concurrency 1,8
+#   python benchmark.py --real --model llama3.2:3b --concurrency 1,2
+#   python benchmark.py --real --backend ollama,llamacpp --model llama3.2:3b
+#   python benchmark.py --router llama3.2:3b,qwen2.5:7b-instruct   # fixed model vs auto-routing
+#   python benchmark.py --imports                # app startup import budget
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import queue
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from backends import FLAVORS, Backends, OllamaBackend, OpenAIBackend
+from db import set_db_path
+from fact_store import get_fact_store
+from model_router import ModelRouter, model_size
+from ollama_client import OLLAMA_HOST
+from request_scheduler import RequestScheduler, percentile
+from tutor_engine import TutorEngine
+
+QUESTIONS_FILE = "old-junk/TEST_QUESTIONS.md"
+DEFAULT_MODEL = "qwen2.5:7b-instruct"
+EMBED_DIM = 768
+GRADE_OPTIONS = {"temperature": 0.0, "num_predict": 4}
+GRADE_PROMPT = """You are grading a tutor's answer to a school student's question.
+
+Question: {question}
+
+Answer:
+{answer}
+
+Is the answer correct, written in {language} and complete enough for the student? Reply with only YES or NO."""
+
+# Startup import check: app.py's imports must stay within budget and must
+# not pull in these (they load on first PDF upload / maths question)
+APP_SCRIPT = "app.py"
+HEAVY_MODULES = ["sympy", "faiss", "pypdf", "langchain_core", "langchain_community", "langchain_ollama", "langchain_text_splitters"]
+IMPORT_BUDGET = 1.5   # seconds
+
+SCRIPT_LANGUAGES = [
+    ("ऀ", "ॿ", "Hindi"),
+    ("஀", "௿", "Tamil"),
+    ("ఀ", "౿", "Telugu"),
+]
+SUBJECT_KEYWORDS = [
+    ("social science", "Social Science"),
+    ("history", "Social Science"),
+    ("math", "Mathematics"),
+    ("trigonometry", "Mathematics"),
+    ("quadratic", "Mathematics"),
+    ("science", "Science"),
+    ("periodic", "Science"),
+    ("essay", "English"),
+]
+
+
+# ==================== FAKE OLLAMA ====================
+class FakeOllama:
+    """Minimal Ollama HTTP API that streams filler tokens at fixed rates.
+
+    prefill_rate is prompt tokens/s, token_rate generated tokens/s; at most
+    `parallel` requests are processed at once (like OLLAMA_NUM_PARALLEL),
+    the rest wait for a slot. Both rates are for DEFAULT_MODEL; other
+    models run faster or slower in proportion to their size. The
+    OpenAI-compatible /v1 endpoints of llama.cpp and vLLM are served too.
+    """
+
+    def __init__(self, token_rate=30.0, prefill_rate=400.0, parallel=2, answer_tokens=120, port=0):
+        self.token_rate = token_rate
+        self.prefill_rate = prefill_rate
+        self.answer_tokens = answer_tokens
+        self._slots = threading.Semaphore(max(1, parallel))
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def _json(self, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _chunk(self, payload, sse=False):
+                data = json.dumps(payload).encode()
+                data = b"data: " + data + b"\n\n" if sse else data + b"\n"
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._json({"models": [{"name": DEFAULT_MODEL, "model": DEFAULT_MODEL, "size": 0}]})
+                elif self.path == "/api/ps":
+                    self._json({"models": []})
+                elif self.path == "/v1/models":
+                    self._json({"object": "list", "data": [{"id": DEFAULT_MODEL, "object": "model"}]})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                body = self._body()
+                if self.path == "/api/chat":
+                    fake.chat(self, body)
+                elif self.path == "/v1/chat/completions":
+                    fake.chat(self, body, openai=True)
+                elif self.path == "/v1/embeddings":
+                    texts = body.get("input") or []
+                    texts = [texts] if isinstance(texts, str) else texts
+                    self._json({"object": "list", "model": body.get("model"), "data": [
+                        {"object": "embedding", "index": i, "embedding": fake_embedding(t)} for i, t in enumerate(texts)]})
+                elif self.path == "/api/embed":
+                    texts = body.get("input") or []
+                    texts = [texts] if isinstance(texts, str) else texts
+                    self._json({"model": body.get("model"), "embeddings": [fake_embedding(t) for t in texts]})
+                elif self.path == "/api/generate":
+                    self._json({"model": body.get("model"), "created_at": _now(), "response": "", "done": True})
+                else:
+                    self.send_error(404)
+
+        return Handler
+
+    def chat(self, handler, body, openai=False):
+        model = body.get("model", DEFAULT_MODEL)
+        prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+        # Decoding is memory-bound, so a 3B model runs about twice as fast as a 7B one
+        speed = model_size(DEFAULT_MODEL) / (model_size(model) or model_size(DEFAULT_MODEL))
+        token_rate, prefill_rate = self.token_rate * speed, self.prefill_rate * speed
+        if body.get("stream") is False:
+            with self._slots:
+                time.sleep(prompt_tokens / prefill_rate + self.answer_tokens / token_rate)
+            content = " ".join(f"tok{i}" for i in range(self.answer_tokens))
+            if openai:
+                handler._json({
+                    "object": "chat.completion", "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": self.answer_tokens},
+                })
+                return
+            handler._json({
+                "model": model, "created_at": _now(), "done": True, "done_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+                "prompt_eval_count": prompt_tokens, "eval_count": self.answer_tokens,
+                "eval_duration": int(self.answer_tokens / token_rate * 1e9),
+            })
+            return
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream" if openai else "application/x-ndjson")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+        try:
+            with self._slots:
+                time.sleep(prompt_tokens / prefill_rate)
+                started = time.perf_counter()
+                for i in range(self.answer_tokens):
+                    time.sleep(1 / token_rate)
+                    if openai:
+                        handler._chunk({"object": "chat.completion.chunk", "model": model, "choices": [
+                            {"index": 0, "delta": {"content": f"tok{i} "}, "finish_reason": None}]}, sse=True)
+                    else:
+                        handler._chunk({"model": model, "created_at": _now(), "done": False,
+                                        "message": {"role": "assistant", "content": f"tok{i} "}})
+                eval_duration = int((time.perf_counter() - started) * 1e9)
+            if openai:
+                handler._chunk({"object": "chat.completion.chunk", "model": model, "choices": [],
+                                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": self.answer_tokens}}, sse=True)
+                data = b"data: [DONE]\n\n"
+                handler.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            else:
+                handler._chunk({
+                    "model": model, "created_at": _now(), "done": True, "done_reason": "stop",
+                    "message": {"role": "assistant", "content": ""},
+                    "prompt_eval_count": prompt_tokens, "eval_count": self.answer_tokens, "eval_duration": eval_duration,
+                })
+            handler.wfile.write(b"0\r\n\r\n")
+            handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass   # client stopped reading (e.g. a pre-empted verification)
+
+
+def _now():
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def fake_embedding(text):
+    """Deterministic unit vector from a hash of the text"""
+    seed = hashlib.sha256(text.encode()).digest()
+    raw = [seed[i % len(seed)] - 127.5 for i in range(EMBED_DIM)]
+    norm = sum(v * v for v in raw) ** 0.5
+    return [v / norm for v in raw]
+
+
+# ==================== QUESTION SETS ====================
+def detect_language(text):
+    for low, high, language in SCRIPT_LANGUAGES:
+        if any(low <= ch <= high for ch in text):
+            return language
+    return "English"
+
+
+def load_questions(path=QUESTIONS_FILE):
+    """Quoted questions under '### N. Heading' lines, as (question, language, subject)"""
+    questions, heading = [], ""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if re.match(r"###\s*\d+\.", line):
+                heading = line.lower()
+            elif heading and line.startswith('"') and line.endswith('"') and len(line) > 2:
+                subject = next((s for word, s in SUBJECT_KEYWORDS if word in heading), "General")
+                questions.append((line[1:-1], detect_language(line), subject))
+                heading = ""
+    return questions
+
+
+# ==================== DRIVER ====================
+def run_turn(engine, session_id, model, question, language, subject, auto_models=None):
+    """One first-turn question through the engine; returns its metrics plus hybrid flag, retries and answer"""
+    turn = engine.ask(session_id, question, [], language, subject, model, auto_models=auto_models)
+    for _ in turn:
+        pass
+    result = dict(turn.metrics)
+    result["hybrid"] = turn.hybrid
+    result["retries"] = turn.retries
+    result["answered_by"] = turn.answered_by
+    result["question"], result["language"], result["answer"] = question, language, turn.answer
+    return result
+
+
+def grade(client, judge, turns):
+    """Share of answers the judge model accepts (asked after timing, one at a time)"""
+    passed = 0
+    for t in turns:
+        prompt = GRADE_PROMPT.format(question=t["question"], answer=t["answer"], language=t["language"])
+        response = client.chat(model=judge, messages=[{"role": "user", "content": prompt}], options=GRADE_OPTIONS)
+        passed += response["message"]["content"].strip().upper().startswith("YES")
+    return passed / len(turns) if turns else None
+
+
+def run_level(client, model, questions, students, max_in_flight, repeat=1, router=None, auto_models=None,
+              judge=None):
+    """All questions (repeated) answered by `students` concurrent sessions on one backend.
+
+    With router and auto_models each question is routed to one of those
+    models instead of model; with judge the answers are graded afterwards.
+    """
+    # No cache, verifier or history: every turn is a fresh generation
+    engine = TutorEngine(client, scheduler=RequestScheduler(max_in_flight), router=router)
+    work = queue.Queue()
+    for _ in range(repeat):
+        for q in questions:
+            work.put(q)
+    turns, errors = [], []
+    lock = threading.Lock()
+
+    def student():
+        session_id = uuid.uuid4().hex
+        while True:
+            try:
+                question, language, subject = work.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                turn = run_turn(engine, session_id, model, question, language, subject, auto_models)
+                with lock:
+                    turns.append(turn)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=student, daemon=True) for _ in range(students)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    result = summarize(turns, errors, students, wall)
+    if judge:
+        result["quality"] = grade(client, judge, turns)
+    return result
+
+
+def summarize(turns, errors, students, wall):
+    latencies = [t["latency"] for t in turns]
+    ttfts = [t["ttft"] for t in turns if t["ttft"] is not None]
+    waits = [t["queue_wait"] for t in turns]
+    tokens = sum(t["eval_tokens"] or 0 for t in turns)
+    decode = [t["tokens_per_sec"] for t in turns if t["tokens_per_sec"]]
+    models = {}
+    for t in turns:
+        models[t["answered_by"]] = models.get(t["answered_by"], 0) + 1
+    return {
+        "students": students,
+        "turns": len(turns),
+        "errors": len(errors),
+        "wall": wall,
+        "turns_per_sec": len(turns) / wall if wall else 0.0,
+        "tokens_per_sec": tokens / wall if wall else 0.0,
+        "decode_tps_p50": percentile(decode, 50),
+        "ttft_p50": percentile(ttfts, 50),
+        "ttft_p95": percentile(ttfts, 95),
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "queue_wait_p95": percentile(waits, 95),
+        "hybrid_hits": sum(1 for t in turns if t["hybrid"]),
+        "script_restarts": sum(t["retries"] for t in turns),
+        "models": models,
+        "quality": None,
+        "first_error": errors[0] if errors else None,
+    }
+
+
+def print_report(results):
+    header = (f"{'backend':>10} {'students':>8} {'turns':>6} {'err':>4} {'turns/s':>8} {'tok/s':>8} {'decode':>8} "
+              f"{'ttft p50':>9} {'ttft p95':>9} {'lat p50':>8} {'lat p95':>8} {'queue p95':>9}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['backend']:>10} {r['students']:>8} {r['turns']:>6} {r['errors']:>4} {r['turns_per_sec']:>8.2f} "
+              f"{r['tokens_per_sec']:>8.1f} {r['decode_tps_p50']:>8.1f} {r['ttft_p50']:>8.2f}s {r['ttft_p95']:>8.2f}s "
+              f"{r['latency_p50']:>7.2f}s {r['latency_p95']:>7.2f}s {r['queue_wait_p95']:>8.2f}s")
+        if len(r["models"]) > 1 or r["quality"] is not None:
+            mix = ", ".join(f"{m} {n}" for m, n in sorted(r["models"].items(), key=lambda item: -item[1]))
+            quality = f" • judged correct {r['quality']:.0%}" if r["quality"] is not None else ""
+            print(f"         models: {mix}{quality}")
+        if r["first_error"]:
+            print(f"         first error: {r['first_error']}")
+
+
+# ==================== STARTUP IMPORTS ====================
+def startup_imports(script=APP_SCRIPT):
+    """Modules a Streamlit script imports at top level"""
+    with open(script, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return modules
+
+
+def measure_imports(modules, runs=3):
+    """Best-of-runs import time in a fresh interpreter, plus heavy modules it loaded"""
+    code = "\n".join([
+        "import json, sys, time",
+        "t = time.perf_counter()",
+        *[f"import {m}" for m in modules],
+        "elapsed = time.perf_counter() - t",
+        f"print(json.dumps([elapsed, [m for m in {HEAVY_MODULES!r} if m in sys.modules]]))",
+    ])
+    best, heavy = None, []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        elapsed, heavy = json.loads(out.strip().splitlines()[-1])
+        best = elapsed if best is None else min(best, elapsed)
+    return best, heavy
+
+
+def check_imports(budget=IMPORT_BUDGET, script=APP_SCRIPT):
+    """Print the startup import report; returns True when within budget"""
+    modules = startup_imports(script)
+    elapsed, heavy = measure_imports(modules)
+    print(f"{script} startup imports: {elapsed:.2f}s (budget {budget:.2f}s) • {', '.join(modules)}")
+    if heavy:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(heavy)}")
+    elif elapsed > budget:
+        print("FAIL: over budget")
+    else:
+        print("OK")
+    return not heavy and elapsed <= budget
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the SkillSling chat pipeline")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated numbers of simultaneous students")
+    parser.add_argument("--questions", default=QUESTIONS_FILE, help="question set in TEST_QUESTIONS.md format")
+    parser.add_argument("--repeat", type=int, default=1, help="times each question is asked per level")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--real", action="store_true", help="use the real backends instead of the fake server")
+    parser.add_argument("--backend", default="ollama",
+                        help="comma-separated backends to compare: names from SKILLSLING_BACKENDS (--real) "
+                             f"or flavors {', '.join(FLAVORS)} (fake server); 'ollama' is always available")
+    parser.add_argument("--router", default="",
+                        help="comma-separated models to auto-route between; each level runs once on --model "
+                             "and once routed")
+    parser.add_argument("--check", action="store_true",
+                        help="with --real: grade every answer with --model as judge (answer quality)")
+    parser.add_argument("--host", default=OLLAMA_HOST)
+    parser.add_argument("--token-rate", type=float, default=30.0, help="fake server: generated tokens per second")
+    parser.add_argument("--prefill-rate", type=float, default=400.0, help="fake server: prompt tokens per second")
+    parser.add_argument("--answer-tokens", type=int, default=120, help="fake server: tokens per answer")
+    parser.add_argument("--parallel", type=int, default=2, help="requests the backend runs at once (scheduler slots)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--imports", action="store_true", help="only check app.py's startup import time; exits 1 on failure")
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET, help="seconds allowed for startup imports")
+    args = parser.parse_args(argv)
+
+    if args.imports:
+        sys.exit(0 if check_imports(args.import_budget) else 1)
+
+    questions = load_questions(args.questions)
+    levels = [int(n) for n in args.concurrency.split(",") if n.strip()]
+
+    names = [n.strip() for n in args.backend.split(",") if n.strip()]
+    auto_models = [m.strip() for m in args.router.split(",") if m.strip()]
+    if args.check and not args.real:
+        parser.error("--check needs --real (the fake server's filler answers can't be graded)")
+    judge = args.model if args.check else None
+
+    def run_router(backends):
+        # Same questions on the fixed model and routed, each routed level
+        # starting from the router's priors (a fresh records file)
+        results = []
+        with tempfile.TemporaryDirectory() as tmp:
+            for n in levels:
+                fixed = run_level(backends, args.model, questions, n, args.parallel, args.repeat, judge=judge)
+                fixed["backend"] = "fixed"
+                router = ModelRouter(os.path.join(tmp, f"router-{n}.db"), get_fact_store().lookup)
+                auto = run_level(backends, args.model, questions, n, args.parallel, args.repeat, router, auto_models,
+                                 judge)
+                auto["backend"] = "auto"
+                router.conn.close()
+                results += [fixed, auto]
+        return results
+
+    def run_all(backends):
+        if auto_models:
+            return run_router(backends)
+        results = []
+        for name in names:
+            # Bench the backend itself, under the name it serves the model as
+            route = backends.routes.get(args.model)
+            served = route[1] if route and route[0] == name else args.model
+            for n in levels:
+                result = run_level(backends.servers[name], served, questions, n, args.parallel, args.repeat)
+                result["backend"] = name
+                results.append(result)
+        return results
+
+    # Fact lookups, drift logs and the like go to a scratch database, not data/skillsling.db
+    with tempfile.TemporaryDirectory(prefix="skillsling-bench-") as scratch:
+        set_db_path(os.path.join(scratch, "skillsling.db"))
+        if args.real:
+            backends = Backends.from_env(args.host)
+            unknown = [n for n in names if n not in backends.servers]
+            if unknown:
+                parser.error(f"unknown backend(s) {', '.join(unknown)}; configured: {', '.join(backends.servers)}")
+            results = run_all(backends)
+        else:
+            unknown = [n for n in names if n != "ollama" and n not in FLAVORS]
+            if unknown:
+                parser.error(f"fake server backends are ollama, {', '.join(FLAVORS)}")
+            with FakeOllama(args.token_rate, args.prefill_rate, args.parallel, args.answer_tokens) as fake:
+                servers = {n: OpenAIBackend(fake.url, n) for n in names if n != "ollama"}
+                results = run_all(Backends(OllamaBackend(fake.url), servers))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        target = args.host if args.real else f"fake server ({args.token_rate:g} tok/s, {args.parallel} parallel)"
+        routed = f" vs auto ({', '.join(auto_models)})" if auto_models else ""
+        print(f"{len(questions)} questions x{args.repeat} • {args.model}{routed} • {target}")
+        print_report(results)
+
+
+if __name__ == "__main__":
+    main()
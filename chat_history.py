@@ -0,0 +1,165 @@
+# Chat history persistence for SkillSling AI
+# Every turn is written to the messages table in data/skillsling.db by a
+# background writer thread, so the Streamlit script never waits on disk.
+# Writes are batched into one transaction; the database runs in WAL mode so
+# history restores can read while the writer is busy. Verifier corrections
+# go through the same queue and replace the assistant row of their turn.
+
+import atexit
+import json
+import queue
+import threading
+from datetime import datetime
+from db import connect
+
+WRITE_BATCH_SIZE = 64
+FLUSH_INTERVAL = 0.5   # seconds a pending write may wait for batch-mates
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    latency REAL,
+    ts TEXT NOT NULL,
+    language TEXT,
+    subject TEXT,
+    model TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_messages_session_ts ON messages(session_id, ts);
+CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages(ts);
+"""
+
+# Timing columns added after the original schema (see metrics.py)
+METRIC_COLUMNS = {
+    "ttft": "REAL",
+    "tokens_per_sec": "REAL",
+    "prompt_tokens": "INTEGER",
+    "eval_tokens": "INTEGER",
+    "queue_wait": "REAL",
+    "stages": "TEXT",
+}
+# Assistant rows carry their turn id, so a verifier correction can replace them
+TURN_COLUMNS = {"turn_id": "TEXT"}
+
+
+class HistoryStore:
+    """Non-blocking writer plus indexed reads for the messages table"""
+
+    def __init__(self, path=None):
+        self._path = path
+        self._queue = queue.Queue()
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(messages)")}
+        for name, kind in {**METRIC_COLUMNS, **TURN_COLUMNS}.items():
+            if name not in existing:
+                conn.execute(f"ALTER TABLE messages ADD COLUMN {name} {kind}")
+        conn.commit()
+        self._write_conn = conn
+        self._read_conn = self._connect()
+        self._read_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        conn = connect(self._path) if self._path else connect()
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def record(self, session_id, role, content, latency=None, language=None, subject=None, model=None, metrics=None,
+               turn_id=None):
+        """Queue one message for writing; returns immediately.
+
+        metrics is a TurnTimer.summary() dict for assistant turns.
+        """
+        ts = datetime.now().isoformat()
+        m = metrics or {}
+        stages = json.dumps(m["stages"]) if m.get("stages") else None
+        self._queue.put(("insert", (
+            session_id, role, content, latency, ts, language, subject, model,
+            m.get("ttft"), m.get("tokens_per_sec"), m.get("prompt_tokens"), m.get("eval_tokens"), m.get("queue_wait"), stages,
+            turn_id,
+        )))
+
+    def correct(self, session_id, turn_id, content):
+        """Queue replacing the answer of an assistant turn (a verifier correction)"""
+        self._queue.put(("correct", (content, session_id, turn_id)))
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < WRITE_BATCH_SIZE:
+                    batch.append(self._queue.get(timeout=FLUSH_INTERVAL))
+            except queue.Empty:
+                pass
+            # A correction always follows its turn's insert, in this batch or an earlier one
+            inserts = [params for kind, params in batch if kind == "insert"]
+            corrections = [params for kind, params in batch if kind == "correct"]
+            try:
+                with self._write_conn:
+                    self._write_conn.executemany(
+                        "INSERT INTO messages (session_id, role, content, latency, ts, language, subject, model, "
+                        "ttft, tokens_per_sec, prompt_tokens, eval_tokens, queue_wait, stages, turn_id) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        inserts,
+                    )
+                    self._write_conn.executemany(
+                        "UPDATE messages SET content = ? WHERE session_id = ? AND turn_id = ? AND role = 'assistant'",
+                        corrections,
+                    )
+            except Exception as e:
+                print(f"History write error: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Block until every queued message is on disk"""
+        self._queue.join()
+
+    def read(self, fn):
+        """Run fn(conn) on the read connection, e.g. metrics.latency_report"""
+        self.flush()
+        with self._read_lock:
+            return fn(self._read_conn)
+
+    def load_session(self, session_id, flush=True):
+        """All messages of a session in order (one indexed range read).
+
+        flush=False reads only what is already committed instead of waiting
+        for every queued write of every session.
+        """
+        if flush:
+            self.flush()
+        with self._read_lock:
+            rows = self._read_conn.execute(
+                "SELECT role, content, latency, turn_id FROM messages WHERE session_id = ? ORDER BY ts, id",
+                (session_id,),
+            ).fetchall()
+        messages = []
+        for row in rows:
+            msg = {"role": row["role"], "content": row["content"]}
+            if row["turn_id"] is not None:
+                msg["id"] = row["turn_id"]
+            if row["latency"] is not None:
+                msg["latency"] = row["latency"]
+            messages.append(msg)
+        return messages
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_history_store():
+    """Process-wide history store (one writer thread per process)"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = HistoryStore()
+            atexit.register(_store.flush)
+        return _store
@@ -0,0 +1,178 @@
+# Conversation context for SkillSling AI
+# Fits each session's chat history into a token budget instead of a fixed
+# number of messages. Turns that no longer fit are folded into a running
+# summary, which a background worker updates incrementally (only newly
+# dropped turns are summarized) at BACKGROUND priority; until it catches up
+# the newest dropped turns are sketched from their first lines.
+#
+# The window start only moves when the budget is exceeded, and then trims
+# well below it (TRIM_TO), so consecutive turns share the same message
+# prefix and Ollama can reuse its KV cache instead of re-reading the prompt.
+
+import os
+import threading
+from collections import OrderedDict, deque
+from functools import lru_cache
+from backends import get_backends
+from ollama_client import KEEP_ALIVE
+from request_scheduler import BACKGROUND, get_scheduler
+
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("SKILLSLING_CONTEXT_TOKENS", "1500"))  # history tokens per prompt
+TRIM_TO = 0.6                  # fraction of the budget kept when the window has to move
+SUMMARY_TOKEN_BUDGET = 250     # max tokens of summary sent with a prompt
+MESSAGE_OVERHEAD = 4           # role/template tokens per message
+MAX_SESSIONS = 500             # per-session window state kept in memory
+SUMMARY_OPTIONS = {"temperature": 0.0, "num_predict": 300}
+SUMMARY_PROMPT = """Update the running summary of a tutoring conversation. Keep the topics, key facts, results and what the student struggled with. At most 120 words, same language as the conversation, no preamble.
+
+Summary so far:
+{summary}
+
+New turns:
+{turns}"""
+
+# Characters per token (Latin text, Indic scripts) by model family; Indic
+# text splits into far more tokens, and how many depends on the vocabulary
+CHARS_PER_TOKEN = {
+    "llama3": (4.0, 2.5),
+    "qwen2.5": (3.8, 1.6),
+    "phi3": (3.6, 1.1),
+}
+DEFAULT_CHARS_PER_TOKEN = (4.0, 2.0)
+
+
+def _family(model):
+    name = (model or "").split(":")[0]
+    return next((f for f in CHARS_PER_TOKEN if name.startswith(f)), None)
+
+
+@lru_cache(maxsize=8192)
+def _count(text, family):
+    latin, indic = CHARS_PER_TOKEN.get(family, DEFAULT_CHARS_PER_TOKEN)
+    n_indic = sum(1 for ch in text if "ऀ" <= ch <= "෿")
+    return max(1, round((len(text) - n_indic) / latin + n_indic / indic))
+
+
+def count_tokens(text, model=None):
+    """Estimated prompt tokens of text for a model"""
+    return _count(text, _family(model))
+
+
+def message_tokens(msg, model=None):
+    return count_tokens(msg["content"], model) + MESSAGE_OVERHEAD
+
+
+def clip_tokens(text, max_tokens, model=None):
+    """Cut text to roughly max_tokens at a word boundary"""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    keep = int(len(text) * max_tokens / count_tokens(text, model))
+    return text[:keep].rsplit(" ", 1)[0] + " …"
+
+
+def sketch(messages, max_tokens, model=None, max_chars=160):
+    """First line of each message, newest kept first, until the real summary catches up"""
+    lines, used = [], 0
+    for m in reversed(messages):
+        first = m["content"].strip().split("\n", 1)[0]
+        if len(first) > max_chars:
+            first = first[:max_chars].rsplit(" ", 1)[0] + " …"
+        line = f"{'Student' if m['role'] == 'user' else 'Tutor'}: {first}"
+        used += count_tokens(line, model)
+        if used > max_tokens:
+            break
+        lines.append(line)
+    return "\n".join(reversed(lines))
+
+
+class _Session:
+    def __init__(self):
+        self.start = 0          # index of the first message still sent verbatim
+        self.summarized = 0     # messages covered by summary
+        self.summary = ""
+        self.pending = False    # a summary update is queued or running
+
+
+class ContextWindow:
+    """Per-session history windows plus the background summarizer"""
+
+    def __init__(self, client=None, scheduler=None, budget=CONTEXT_TOKEN_BUDGET):
+        self.client = client or get_backends()
+        self.scheduler = scheduler or get_scheduler()
+        self.budget = budget
+        self._sessions = OrderedDict()
+        self._jobs = deque()
+        self._cond = threading.Condition()
+        self.stats = {"summaries": 0, "summary_errors": 0}
+        threading.Thread(target=self._run, name="summarizer", daemon=True).start()
+
+    def _session(self, session_id, n_messages):
+        state = self._sessions.get(session_id)
+        if state is None or state.start >= n_messages:
+            # New session, or the history was replaced under us
+            state = _Session()
+            self._sessions[session_id] = state
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > MAX_SESSIONS:
+            self._sessions.popitem(last=False)
+        return state
+
+    def fit(self, session_id, history, model):
+        """(summary, recent) for a history ending with the new user message.
+
+        recent is the verbatim tail that fits the budget, starting at a user
+        message; summary covers everything before it ("" if nothing).
+        """
+        costs = [message_tokens(m, model) for m in history]
+        with self._cond:
+            state = self._session(session_id, len(history))
+            start = state.start
+            total = sum(costs[start:])
+            if total > self.budget:
+                target = self.budget * TRIM_TO
+                while start < len(history) - 1 and (total > target or history[start]["role"] != "user"):
+                    total -= costs[start]
+                    start += 1
+                state.start = start
+            if state.summarized < start and not state.pending:
+                state.pending = True
+                self._jobs.append((state, session_id, model, state.summary, history[state.summarized:start], start))
+                self._cond.notify()
+            summary = state.summary
+            unsummarized = history[state.summarized:start]
+        summary = clip_tokens(summary, SUMMARY_TOKEN_BUDGET, model) if summary else ""
+        if unsummarized:
+            room = SUMMARY_TOKEN_BUDGET - (count_tokens(summary, model) if summary else 0)
+            summary = "\n".join(filter(None, [summary, sketch(unsummarized, room, model)]))
+        return summary, history[start:]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._jobs:
+                    self._cond.wait()
+                state, session_id, model, summary, messages, upto = self._jobs.popleft()
+            try:
+                updated = self._summarize(session_id, model, summary, messages)
+            except Exception as e:
+                print(f"Summary error: {e}")
+                updated = None
+                self.stats["summary_errors"] += 1
+            with self._cond:
+                state.pending = False
+                if updated and upto > state.summarized and upto <= state.start:
+                    state.summary = updated
+                    state.summarized = upto
+                    self.stats["summaries"] += 1
+
+    def _summarize(self, session_id, model, summary, messages):
+        turns = "\n\n".join(f"{'Student' if m['role'] == 'user' else 'Tutor'}: {m['content']}" for m in messages)
+        prompt = SUMMARY_PROMPT.format(summary=summary or "(none)", turns=turns)
+        with self.scheduler.slot(session_id, model, BACKGROUND):
+            response = self.client.chat(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                options=SUMMARY_OPTIONS,
+                keep_alive=KEEP_ALIVE,
+            )
+        return response["message"]["content"].strip()
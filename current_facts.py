@@ -1,5 +1,7 @@
 # Manual current facts database for SkillSling AI
-# This is manually updated - no API key needed
+# This is manually updated - no API key needed.
+# These entries seed the "current" source of the fact store (fact_store.py);
+# later edits can go straight into the database with its import CLI.
 
 # Current facts (verified Feb 2026)
 CURRENT_FACTS = {
@@ -37,11 +39,7 @@ CURRENT_FACTS = {
 }
 
 def get_current_facts(query):
-    """Check if query is about current facts"""
-    query_lower = query.lower()
-    
-    for key, value in CURRENT_FACTS.items():
-        if key in query_lower:
-            return value
-    
-    return None
+    """Check if query is about current facts (most specific matching key wins)"""
+    from fact_store import get_fact_store
+    match = get_fact_store().lookup(query, source="current")
+    return match[1] if match else None
@@ -0,0 +1,24 @@
+# Shared SQLite access for SkillSling AI
+# Everything persistent lives in data/skillsling.db (SKILLSLING_DB or
+# set_db_path() point it elsewhere, e.g. for benchmark runs)
+
+import os
+import sqlite3
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DB_PATH = os.environ.get("SKILLSLING_DB", os.path.join(DATA_DIR, "skillsling.db"))
+
+
+def set_db_path(path):
+    """Use another database file for every later connect() without a path"""
+    global DB_PATH
+    DB_PATH = path
+
+
+def connect(path=None):
+    """Open a connection that may be shared across threads (callers serialize access)"""
+    path = path or DB_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
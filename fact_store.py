@@ -0,0 +1,244 @@
+# Fact store for SkillSling AI
+# Verified facts live in data/skillsling.db, so they can be updated without
+# a redeploy. Prompt lookups probe an index of normalized keys; an FTS5
+# index (with Hindi/Tamil/Telugu-aware tokenization) serves full-text search.
+# Triggers bump a version row on every change, so cached lookups are dropped
+# when facts are imported by another process too.
+#
+#   python fact_store.py import facts.csv      # columns: source,key,value
+#   python fact_store.py export facts.csv [--source history]
+#   python fact_store.py search "quit india"
+
+import argparse
+import csv
+import sys
+import threading
+import time
+import unicodedata
+from functools import lru_cache
+from db import connect
+
+# unicode61 treats combining marks as separators, which splits Devanagari,
+# Tamil and Telugu words at every matra/virama. Declare them token chars.
+_INDIC_BLOCKS = [(0x0900, 0x0980), (0x0B80, 0x0C00), (0x0C00, 0x0C80)]
+_INDIC_MARKS = "".join(
+    chr(c) for lo, hi in _INDIC_BLOCKS for c in range(lo, hi) if unicodedata.category(chr(c)).startswith("M")
+)
+FTS_TOKENIZER = f"unicode61 remove_diacritics 0 tokenchars '{_INDIC_MARKS}'"
+
+LOOKUP_CACHE_SIZE = 4096
+
+# Seed data for a fresh database (Social Science / General fast path)
+HISTORY_FACTS = {
+    "indian independence": "15 August 1947",
+    "french revolution": "1789",
+    "non cooperation movement": "1920",
+    "quit india movement": "1942",
+    "first battle of panipat": "1526",
+    "battle of plassey": "1757",
+    "revolt of 1857": "1857",
+    "world war ii end": "1945",
+}
+
+
+def tokenize(text):
+    """Split text the same way the FTS tokenizer does (letters, marks, digits)"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return "".join(ch if unicodedata.category(ch)[0] in "LMN" else " " for ch in text).split()
+
+
+class FactStore:
+    def __init__(self, path=None):
+        self.conn = connect(path) if path else connect()
+        self.lock = threading.Lock()
+        self._lookup = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._lookup_uncached)
+        with self.lock:
+            self.conn.executescript(f"""
+                CREATE TABLE IF NOT EXISTS facts (
+                    id INTEGER PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    norm_key TEXT NOT NULL,
+                    ntokens INTEGER NOT NULL,
+                    updated REAL NOT NULL,
+                    UNIQUE(source, key)
+                );
+                CREATE INDEX IF NOT EXISTS idx_facts_norm_key ON facts(norm_key);
+                CREATE VIRTUAL TABLE IF NOT EXISTS facts_fts USING fts5(
+                    key, value, content='facts', content_rowid='id', tokenize="{FTS_TOKENIZER}"
+                );
+                CREATE TRIGGER IF NOT EXISTS facts_ai AFTER INSERT ON facts BEGIN
+                    INSERT INTO facts_fts(rowid, key, value) VALUES (new.id, new.key, new.value);
+                END;
+                CREATE TRIGGER IF NOT EXISTS facts_ad AFTER DELETE ON facts BEGIN
+                    INSERT INTO facts_fts(facts_fts, rowid, key, value) VALUES ('delete', old.id, old.key, old.value);
+                END;
+                CREATE TRIGGER IF NOT EXISTS facts_au AFTER UPDATE ON facts BEGIN
+                    INSERT INTO facts_fts(facts_fts, rowid, key, value) VALUES ('delete', old.id, old.key, old.value);
+                    INSERT INTO facts_fts(rowid, key, value) VALUES (new.id, new.key, new.value);
+                END;
+                CREATE TABLE IF NOT EXISTS facts_version (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    version INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO facts_version (id, version) VALUES (0, 0);
+                CREATE TRIGGER IF NOT EXISTS facts_version_ai AFTER INSERT ON facts BEGIN
+                    UPDATE facts_version SET version = version + 1;
+                END;
+                CREATE TRIGGER IF NOT EXISTS facts_version_ad AFTER DELETE ON facts BEGIN
+                    UPDATE facts_version SET version = version + 1;
+                END;
+                CREATE TRIGGER IF NOT EXISTS facts_version_au AFTER UPDATE ON facts BEGIN
+                    UPDATE facts_version SET version = version + 1;
+                END;
+            """)
+            self.conn.commit()
+        self._version = None
+        self._max_tokens = 0
+        self._refresh()
+
+    def _refresh(self):
+        """Reload the longest key length and drop cached lookups if the facts changed"""
+        with self.lock:
+            version = self.conn.execute("SELECT version FROM facts_version").fetchone()[0]
+            if version == self._version:
+                return
+            self._max_tokens = self.conn.execute("SELECT COALESCE(MAX(ntokens), 0) FROM facts").fetchone()[0]
+            self._version = version
+        self._lookup.cache_clear()
+
+    def import_rows(self, rows):
+        """Bulk upsert (source, key, value) rows in one transaction. Returns the count."""
+        now = time.time()
+        data = []
+        for src, key, value in rows:
+            tokens = tokenize(key)
+            if tokens:
+                data.append((src.strip(), key.strip().lower(), value.strip(), " ".join(tokens), len(tokens), now))
+        with self.lock:
+            self.conn.executemany(
+                "INSERT INTO facts (source, key, value, norm_key, ntokens, updated) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(source, key) DO UPDATE SET value = excluded.value, updated = excluded.updated",
+                data,
+            )
+            self.conn.commit()
+        self._refresh()
+        return len(data)
+
+    def export_rows(self, source=None):
+        with self.lock:
+            if source:
+                cur = self.conn.execute("SELECT source, key, value FROM facts WHERE source = ? ORDER BY id", (source,))
+            else:
+                cur = self.conn.execute("SELECT source, key, value FROM facts ORDER BY id")
+            return [tuple(r) for r in cur.fetchall()]
+
+    def count(self, source=None):
+        with self.lock:
+            if source:
+                return self.conn.execute("SELECT COUNT(*) FROM facts WHERE source = ?", (source,)).fetchone()[0]
+            return self.conn.execute("SELECT COUNT(*) FROM facts").fetchone()[0]
+
+    def seed_defaults(self):
+        """Load the built-in facts into an empty store"""
+        from current_facts import CURRENT_FACTS
+        for source, facts in (("history", HISTORY_FACTS), ("current", CURRENT_FACTS)):
+            if not self.count(source):
+                self.import_rows((source, k, v) for k, v in facts.items())
+
+    def lookup(self, text, source=None):
+        """Most specific fact key mentioned in text as (key, value), or None"""
+        self._refresh()
+        return self._lookup(" ".join(tokenize(text)), source)
+
+    def _lookup_uncached(self, normalized, source):
+        # A key is mentioned iff its token sequence is a contiguous n-gram of
+        # the prompt, so probe the norm_key index with every n-gram up to the
+        # longest key: a handful of B-tree lookups however many facts exist
+        tokens = normalized.split()
+        ngrams = {
+            " ".join(tokens[i:j])
+            for i in range(len(tokens))
+            for j in range(i + 1, min(len(tokens), i + self._max_tokens) + 1)
+        }
+        if not ngrams:
+            return None
+        sql = f"SELECT key, value, ntokens FROM facts WHERE norm_key IN ({','.join('?' * len(ngrams))})"
+        params = list(ngrams)
+        if source:
+            sql += " AND source = ?"
+            params.append(source)
+        sql += " ORDER BY ntokens DESC, LENGTH(norm_key) DESC LIMIT 1"
+        with self.lock:
+            row = self.conn.execute(sql, params).fetchone()
+        return (row["key"], row["value"]) if row else None
+
+    def search(self, query, limit=10, source=None):
+        """Full-text search over keys and values, best first"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        sql = ("SELECT f.source, f.key, f.value, bm25(facts_fts) AS score FROM facts_fts "
+               "JOIN facts f ON f.id = facts_fts.rowid WHERE facts_fts MATCH ?")
+        params = [" OR ".join(f'"{t}"' for t in tokens)]
+        if source:
+            sql += " AND f.source = ?"
+            params.append(source)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            return [dict(r) for r in self.conn.execute(sql, params).fetchall()]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_fact_store():
+    """Process-wide store, seeded on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FactStore()
+            _store.seed_defaults()
+        return _store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the SkillSling fact store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_import = sub.add_parser("import", help="bulk import a CSV with columns source,key,value")
+    p_import.add_argument("path")
+    p_import.add_argument("--source", help="use this source for every row (CSV then only needs key,value)")
+    p_export = sub.add_parser("export", help="export facts to CSV ('-' for stdout)")
+    p_export.add_argument("path")
+    p_export.add_argument("--source")
+    p_search = sub.add_parser("search", help="full-text search")
+    p_search.add_argument("query")
+    p_search.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    store = get_fact_store()
+    if args.command == "import":
+        with open(args.path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            rows = ([args.source] + r[:2] if args.source else r[:3] for r in reader if r)
+            rows = (r for r in rows if len(r) == 3 and r[1].lower() != "key")
+            print(f"Imported {store.import_rows(rows)} facts")
+    elif args.command == "export":
+        out = sys.stdout if args.path == "-" else open(args.path, "w", newline="", encoding="utf-8")
+        try:
+            writer = csv.writer(out)
+            writer.writerow(["source", "key", "value"])
+            writer.writerows(store.export_rows(args.source))
+        finally:
+            if out is not sys.stdout:
+                out.close()
+    elif args.command == "search":
+        for hit in store.search(args.query, args.limit):
+            print(f"[{hit['source']}] {hit['key']}: {hit['value']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+# Symbolic maths engine for SkillSling AI
+# Recognises integrals (definite and indefinite), derivatives, equations,
+# limits and simplify/factor/expand requests in a student's question and
+# solves them with sympy, so the tutor starts from an exact result – or
+# answers outright without an LLM call (MATH_DIRECT_ANSWER).
+#
+# Questions are parsed with sympy's expression parser (implicit
+# multiplication, ^ for powers) after a whitelist check, because
+# parse_expr evaluates Python. Solving runs in worker processes with a hard
+# timeout (a stuck worker is killed and replaced), so 9^9^9 or a nasty
+# integral can't hang a session, and results are memoized by the canonical
+# (unevaluated) form of the problem.
+
+import json
+import os
+import queue
+import re
+import subprocess
+import sys
+import threading
+from functools import lru_cache
+
+MATH_TIMEOUT = 3.0       # seconds a single problem may take
+MATH_WORKERS = 2
+WORKER_START_TIMEOUT = 30.0   # seconds a new worker may take to import sympy
+MATH_CACHE_SIZE = 2048
+MATH_DIRECT_ANSWER = os.environ.get("SKILLSLING_MATH_DIRECT", "0") == "1"   # default for engine.ask(direct_math=None)
+
+# Operation -> words that ask for it (checked in this order)
+OPERATIONS = [
+    ("integrate", r"∫|\bintegra(?:te|l|tion)\b|\bantiderivative\b"),
+    ("differentiate", r"\bdifferentiate\b|\bderivative\b|\bd/d[a-z]\b"),
+    ("limit", r"\blimit\b|\blim\b"),
+    ("solve", r"\bsolve\b|\bfind the roots?\b"),
+    ("factor", r"\bfactori[sz]e\b|\bfactor\b"),
+    ("expand", r"\bexpand\b"),
+    ("simplify", r"\bsimplify\b"),
+]
+FUNCTION_NAMES = {
+    "sin", "cos", "tan", "sec", "csc", "cot", "asin", "acos", "atan", "sinh", "cosh", "tanh",
+    "exp", "log", "ln", "sqrt", "abs", "factorial", "pi", "e", "oo", "inf", "infinity",
+}
+UNICODE_MATH = {"²": "^2", "³": "^3", "√": "sqrt", "π": "pi", "×": "*", "÷": "/", "−": "-", "∞": "oo", "→": "->"}
+# Filler words around the expression ("integrate x^2 dx from 0 to 1 please")
+FILLER = re.compile(
+    r"\b(?:what|is|the|of|find|calculate|compute|evaluate|please|value|integral|integrate|integration|"
+    r"antiderivative|derivative|differentiate|limit|lim|solve|simplify|factori[sz]e|factor|expand|equation|"
+    r"expression|function|and|show|steps|step|by|me|for|a|an)\b|∫|\?",
+    re.IGNORECASE,
+)
+ALLOWED_CHARS = re.compile(r"^[A-Za-z0-9\s+\-*/^().,=!]*$")
+
+OP_NAMES = {
+    "integrate": "integral", "differentiate": "derivative", "limit": "limit",
+    "solve": "solution", "factor": "factorised form", "expand": "expansion", "simplify": "simplified form",
+}
+
+
+class MathProblem:
+    def __init__(self, op, expr, var=None, lower=None, upper=None, point=None):
+        self.op = op
+        self.expr = expr          # canonical sympy string, unevaluated
+        self.var = var
+        self.lower = lower
+        self.upper = upper
+        self.point = point
+
+    @property
+    def key(self):
+        return (self.op, self.expr, self.var, self.lower, self.upper, self.point)
+
+
+class MathResult:
+    def __init__(self, problem, statement, result, text):
+        self.problem = problem
+        self.statement = statement   # LaTeX of the question, e.g. \int x^{2}\, dx
+        self.result = result         # LaTeX of the answer
+        self.text = text             # plain sympy string of the answer
+
+    @property
+    def equation(self):
+        joiner = "\\quad\\Rightarrow\\quad" if self.problem.op == "solve" else "="
+        return f"{self.statement} {joiner} {self.result}"
+
+    def seed(self):
+        """Short result line the LLM is asked to elaborate on"""
+        return (f"The {OP_NAMES[self.problem.op]} is **$\\boxed{{{self.result}}}$** "
+                f"(${self.equation}$).\n\nLet me explain step-by-step...")
+
+    def markdown(self):
+        """Complete answer without an LLM"""
+        return (f"$$\n{self.equation}\n$$\n\n"
+                f"**Final answer:** $\\boxed{{{self.result}}}$\n\n"
+                f"_Solved exactly with SymPy._")
+
+
+# ==================== PARSING ====================
+def _transformations():
+    from sympy.parsing.sympy_parser import convert_xor, implicit_multiplication_application, standard_transformations
+    return standard_transformations + (implicit_multiplication_application, convert_xor)
+
+
+def _local_dict():
+    import sympy as sp
+    return {"e": sp.E, "ln": sp.log, "inf": sp.oo, "infinity": sp.oo, "abs": sp.Abs}
+
+
+def _safe(text):
+    """Only arithmetic, known function names and single-letter variables reach parse_expr"""
+    if not text or "__" in text or not ALLOWED_CHARS.match(text):
+        return False
+    return all(len(name) == 1 or name.lower() in FUNCTION_NAMES for name in re.findall(r"[A-Za-z_]+", text))
+
+
+def _parse(text):
+    """Canonical, unevaluated sympy string for a snippet, or None"""
+    from sympy.parsing.sympy_parser import parse_expr
+    text = text.strip(" .,:;")
+    if not _safe(text):
+        return None
+    try:
+        return str(parse_expr(text, local_dict=_local_dict(), transformations=_transformations(), evaluate=False))
+    except Exception:
+        return None
+
+
+def parse_problem(prompt):
+    """MathProblem for a maths question, or None if it isn't one we can solve"""
+    import sympy as sp
+    text = prompt
+    for char, repl in UNICODE_MATH.items():
+        text = text.replace(char, repl)
+    lowered = text.lower()
+    op = next((name for name, pattern in OPERATIONS if re.search(pattern, lowered)), None)
+    if op is None:
+        return None
+
+    var = lower = upper = point = None
+    # d/dy, "with respect to y", "dy" at the end
+    m = re.search(r"\bd/d([a-z])\b", text) or re.search(r"\b(?:with respect to|w\.?r\.?t\.?)\s+([a-z])\b", text)
+    if m:
+        var = m.group(1)
+        text = text[:m.start()] + " " + text[m.end():]
+    m = re.search(r"\bd([a-z])\s*(?=$|[\s?.,]|from\b)", text)
+    if m and op == "integrate":
+        var = var or m.group(1)
+        text = text[:m.start()] + " " + text[m.end():]
+    m = re.search(r"\bfrom\s+(\S+)\s+to\s+(\S+)", text)
+    if m and op == "integrate":
+        lower, upper = _parse(m.group(1)), _parse(m.group(2))
+        if lower is None or upper is None:
+            return None
+        text = text[:m.start()] + " " + text[m.end():]
+    m = re.search(r"(?:\bas\s+)?\b([a-z])\s*(?:->|approaches|tends to)\s*(-?[\w.]+)", text)
+    if m and op == "limit":
+        var, point = m.group(1), _parse(m.group(2))
+        if point is None:
+            return None
+        text = text[:m.start()] + " " + text[m.end():]
+    m = re.search(r"\bfor\s+([a-z])\s*[?.]?\s*$", text)
+    if m and op == "solve":
+        var = m.group(1)
+        text = text[:m.start()]
+
+    text = FILLER.sub(" ", text)
+    if op == "solve" and text.count("=") == 1:
+        lhs, rhs = (_parse(side) for side in text.split("="))
+        expr = f"({lhs}) - ({rhs})" if lhs and rhs else None
+    else:
+        expr = _parse(text)
+    if expr is None:
+        return None
+    symbols = sorted(str(s) for s in sp.sympify(expr, evaluate=False).free_symbols)
+    if var is None:
+        var = "x" if "x" in symbols else (symbols[0] if symbols else None)
+    if var is None and op in ("integrate", "differentiate", "limit", "solve"):
+        return None
+    return MathProblem(op, expr, var, lower, upper, point)
+
+
+# ==================== SOLVING (worker processes) ====================
+def _solve_in_worker(op, expr, var, lower, upper, point):
+    """Runs in the worker; returns (statement_latex, result_latex, result_text) or None"""
+    import sympy as sp
+    f = sp.sympify(expr)
+    x = sp.Symbol(var) if var else None
+    if op == "integrate":
+        if lower is not None:
+            a, b = sp.sympify(lower), sp.sympify(upper)
+            result = sp.integrate(f, (x, a, b))
+            statement = f"\\int_{{{sp.latex(a)}}}^{{{sp.latex(b)}}} {sp.latex(f)} \\, d{var}"
+        else:
+            result = sp.integrate(f, x)
+            statement = f"\\int {sp.latex(f)} \\, d{var}"
+        if result.has(sp.Integral):
+            return None
+        latex = sp.latex(result) + ("" if lower is not None else " + C")
+        return statement, latex, str(result)
+    if op == "differentiate":
+        result = sp.simplify(sp.diff(f, x))
+        return f"\\frac{{d}}{{d{var}}}\\left({sp.latex(f)}\\right)", sp.latex(result), str(result)
+    if op == "limit":
+        a = sp.sympify(point)
+        result = sp.limit(f, x, a)
+        return f"\\lim_{{{var} \\to {sp.latex(a)}}} {sp.latex(f)}", sp.latex(result), str(result)
+    if op == "solve":
+        roots = sp.solve(sp.Eq(f, 0), x)
+        if not roots:
+            return f"{sp.latex(f)} = 0", "\\text{no solution}", "no solution"
+        latex = ", \\; ".join(f"{var} = {sp.latex(r)}" for r in roots)
+        return f"{sp.latex(f)} = 0", latex, ", ".join(str(r) for r in roots)
+    transform = {"factor": sp.factor, "expand": sp.expand, "simplify": sp.simplify}[op]
+    result = transform(f)
+    return sp.latex(f), sp.latex(result), str(result)
+
+
+def _worker_main():
+    """Solver process loop: one JSON request per stdin line, one reply per stdout line"""
+    import sympy   # noqa: F401 – loaded before the first request, outside its timeout
+    sys.stdout.write(json.dumps({"ready": True}) + "\n")
+    sys.stdout.flush()
+    for line in sys.stdin:
+        try:
+            reply = {"ok": _solve_in_worker(*json.loads(line))}
+        except Exception as e:
+            reply = {"error": str(e)}
+        sys.stdout.write(json.dumps(reply) + "\n")
+        sys.stdout.flush()
+
+
+class _Worker:
+    """A solver subprocess. Plain subprocesses rather than multiprocessing:
+    Streamlit swaps in the app script as __main__, which multiprocessing
+    would re-run in every child, and a stuck solve can simply be killed."""
+
+    def __init__(self):
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, encoding="utf-8",
+        )
+        self.replies = queue.Queue()
+        self.ready = threading.Event()
+        threading.Thread(target=self._read, name="math-worker-reader", daemon=True).start()
+
+    def _read(self):
+        for line in self.proc.stdout:
+            reply = json.loads(line)
+            if reply.get("ready"):
+                self.ready.set()
+            else:
+                self.replies.put(reply)
+        self.ready.set()
+        self.replies.put(None)   # process exited
+
+    def call(self, args, timeout):
+        """Reply dict, or None if the process died; raises queue.Empty on timeout"""
+        self.ready.wait(WORKER_START_TIMEOUT)
+        self.proc.stdin.write(json.dumps(args) + "\n")
+        self.proc.stdin.flush()
+        return self.replies.get(timeout=timeout)
+
+    def kill(self):
+        self.proc.kill()
+
+
+_idle = queue.Queue()
+_workers = 0
+_workers_lock = threading.Lock()
+stats = {"solved": 0, "unsolved": 0, "timeouts": 0}
+
+
+def _acquire():
+    """An idle worker, a new one while under MATH_WORKERS, else wait for either"""
+    global _workers
+    block = False
+    while True:
+        try:
+            worker = _idle.get(block=block)
+        except queue.Empty:
+            worker = None
+        if worker is not None:
+            return worker
+        with _workers_lock:
+            if _workers < MATH_WORKERS:
+                _workers += 1
+                try:
+                    return _Worker()
+                except Exception:
+                    _workers -= 1
+                    raise
+        block = True
+
+
+def _discard(worker):
+    global _workers
+    worker.kill()
+    with _workers_lock:
+        _workers -= 1
+    # Wakes a caller waiting in _acquire, which then starts a replacement
+    _idle.put(None)
+
+
+def warm_up():
+    """Start a worker (and its sympy import) ahead of the first question"""
+    if _workers == 0:
+        _idle.put(_acquire())
+
+
+class _WorkerDied(Exception):
+    """Raised through the cache, so a crashed worker's non-answer isn't memoized"""
+
+
+@lru_cache(maxsize=MATH_CACHE_SIZE)
+def _solve_cached(op, expr, var, lower, upper, point):
+    """Solved tuple, or None for unsolvable and timed-out problems (both memoized)"""
+    worker = _acquire()
+    try:
+        reply = worker.call([op, expr, var, lower, upper, point], MATH_TIMEOUT)
+    except queue.Empty:
+        stats["timeouts"] += 1
+        _discard(worker)
+        return None
+    except OSError as e:
+        _discard(worker)
+        raise _WorkerDied() from e
+    if reply is None:
+        _discard(worker)
+        raise _WorkerDied()
+    _idle.put(worker)
+    return tuple(reply["ok"]) if reply.get("ok") else None
+
+
+def solve(prompt):
+    """MathResult for a maths question, or None (not maths, unsupported or timed out)"""
+    problem = parse_problem(prompt)
+    if problem is None:
+        return None
+    try:
+        solved = _solve_cached(*problem.key)
+    except _WorkerDied:
+        solved = None
+    if solved is None:
+        stats["unsolved"] += 1
+        return None
+    stats["solved"] += 1
+    return MathResult(problem, *solved)
+
+
+if __name__ == "__main__" and sys.argv[1:] == ["--worker"]:
+    _worker_main()
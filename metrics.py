@@ -0,0 +1,115 @@
+# Per-turn timing for SkillSling AI
+# A TurnTimer follows one answer through the pipeline: named stage timings,
+# time to first token, and Ollama's own token counts from the final chunk.
+# Summaries are stored with the assistant message in the messages table and
+# aggregated into p50/p95/p99 reports for the admin dashboard.
+
+import json
+import time
+from contextlib import contextmanager
+from request_scheduler import percentile
+
+STAGES = ["retrieval", "cache", "engines", "prompt", "queue", "first_token", "streaming"]
+
+
+class TurnTimer:
+    def __init__(self, model=None):
+        self.model = model
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.ttft = None
+        self.tokens = {}
+
+    @contextmanager
+    def stage(self, name):
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - began)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def first_token(self):
+        """Call when the first text reaches the student"""
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.start
+
+    def observe(self, chunk):
+        """Pick up Ollama's counters from the final (done) chunk"""
+        if not chunk.get("done"):
+            return
+        for field in ("eval_count", "eval_duration", "prompt_eval_count", "prompt_eval_duration", "load_duration"):
+            value = chunk.get(field)
+            if value is not None:
+                self.tokens[field] = value
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    @property
+    def tokens_per_sec(self):
+        count, duration = self.tokens.get("eval_count"), self.tokens.get("eval_duration")
+        return count / (duration / 1e9) if count and duration else None
+
+    def summary(self):
+        return {
+            "latency": self.elapsed,
+            "ttft": self.ttft,
+            "tokens_per_sec": self.tokens_per_sec,
+            "prompt_tokens": self.tokens.get("prompt_eval_count"),
+            "eval_tokens": self.tokens.get("eval_count"),
+            "queue_wait": self.stages.get("queue", 0.0),
+            "stages": {k: round(v, 4) for k, v in self.stages.items()},
+        }
+
+
+def latency_report(conn, since=None, group_by=("model", "subject")):
+    """p50/p95/p99 of latency and TTFT per group from assistant messages"""
+    cols = ", ".join(group_by)
+    sql = f"SELECT {cols}, latency, ttft, tokens_per_sec, queue_wait FROM messages WHERE role = 'assistant' AND latency IS NOT NULL"
+    params = []
+    if since:
+        sql += " AND ts >= ?"
+        params.append(since)
+    groups = {}
+    for row in conn.execute(sql, params).fetchall():
+        groups.setdefault(tuple(row[c] for c in group_by), []).append(row)
+    report = []
+    for key, rows in sorted(groups.items(), key=lambda kv: tuple(str(k) for k in kv[0])):
+        latencies = [r["latency"] for r in rows]
+        ttfts = [r["ttft"] for r in rows if r["ttft"] is not None]
+        rates = [r["tokens_per_sec"] for r in rows if r["tokens_per_sec"]]
+        waits = [r["queue_wait"] for r in rows if r["queue_wait"] is not None]
+        entry = dict(zip(group_by, key))
+        entry.update({
+            "turns": len(rows),
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95),
+            "latency_p99": percentile(latencies, 99),
+            "ttft_p50": percentile(ttfts, 50) if ttfts else None,
+            "ttft_p95": percentile(ttfts, 95) if ttfts else None,
+            "ttft_p99": percentile(ttfts, 99) if ttfts else None,
+            "tokens_per_sec": sum(rates) / len(rates) if rates else None,
+            "queue_wait_p95": percentile(waits, 95) if waits else None,
+        })
+        report.append(entry)
+    return report
+
+
+def stage_breakdown(conn, since=None):
+    """Mean seconds per stage over recent assistant turns"""
+    sql = "SELECT stages FROM messages WHERE role = 'assistant' AND stages IS NOT NULL"
+    params = []
+    if since:
+        sql += " AND ts >= ?"
+        params.append(since)
+    totals, counts = {}, {}
+    for (raw,) in conn.execute(sql, params).fetchall():
+        for name, seconds in json.loads(raw).items():
+            totals[name] = totals.get(name, 0.0) + seconds
+            counts[name] = counts.get(name, 0) + 1
+    ordered = [s for s in STAGES if s in totals] + sorted(set(totals) - set(STAGES))
+    return {name: totals[name] / counts[name] for name in ordered}
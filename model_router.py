@@ -0,0 +1,227 @@
+# Model router for SkillSling AI
+# Picks a model per question instead of one model per subject: greetings
+# and short factual questions go to the small models, long explanations,
+# maths and Indic-language answers to the 7-8B ones. Each prompt gets a
+# complexity score from cheap features (no model call, no sympy import);
+# a model is trusted with a score band up to its prior capability until
+# enough answers in that band have been checked, after which its recorded
+# failure rate (verifier corrections + script restarts) decides. Among the
+# trusted models the fastest one (recorded latency, else size) answers.
+# A small share of questions explores a cheaper, not yet proven model so
+# the records keep growing. Records live in data/skillsling.db.
+
+import os
+import random
+import re
+import threading
+from db import connect
+from math_engine import OPERATIONS
+from response_cache import normalize_prompt
+
+AUTO_ROUTE = os.environ.get("SKILLSLING_AUTO_MODEL", "0") == "1"   # default for the auto-pick toggle; off keeps the chosen model
+
+# Parameters (billions) and prior capability: the highest complexity score
+# the model is trusted with before its answers have been checked
+MODEL_PROFILES = {
+    "llama3.2:3b": (3.2, 0.40),
+    "phi3:mini": (3.8, 0.35),
+    "qwen2.5:7b-instruct-q4_K_M": (7.6, 0.80),
+    "qwen2.5:7b-instruct": (7.6, 0.90),
+    "llama3.1:8b": (8.0, 0.85),
+}
+BANDS = [(0.35, "easy"), (0.65, "medium"), (1.01, "hard")]
+MIN_CHECKS = 20            # checked answers in a band before the record overrides the prior
+MAX_FAILURE_RATE = 0.15    # corrected or restarted answers tolerated per band
+MIN_TURNS = 10             # answers before recorded latency replaces the size estimate
+PRIOR_SECONDS_PER_B = 1.5  # rough answer seconds per billion parameters
+EXPLORE_RATE = 0.05        # questions routed to a cheaper unproven model
+EXPLORE_MARGIN = 0.25      # ...if its prior capability is at most this far below the score
+
+SUBJECT_WEIGHTS = {"Mathematics": 0.25, "Science": 0.2, "Social Science": 0.1, "English": 0.1, "General": 0.0}
+# Small models drift out of Indic scripts far more often (see script_guard)
+LANGUAGE_WEIGHTS = {"Hindi": 0.3, "Tamil": 0.3, "Telugu": 0.3, "Hinglish": 0.15, "English": 0.0}
+INDIC = {"Hindi", "Tamil", "Telugu"}
+GREETINGS = {"hi", "hello", "hey", "thanks", "thank", "ok", "okay", "bye", "namaste", "good", "morning", "evening"}
+REASONING = re.compile(r"\b(?:why|explain|derive|prove|compare|difference|analy[sz]e|describe|how does|how do|justify)\b")
+MATH = re.compile("|".join(pattern for _, pattern in OPERATIONS) + r"|[=^√∫]|\d\s*[-+*/×÷]\s*\d")
+NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+def model_size(model):
+    """Billions of parameters, from the profile table or a "7b"-style tag"""
+    if model in MODEL_PROFILES:
+        return MODEL_PROFILES[model][0]
+    m = re.search(r"(\d+(?:\.\d+)?)b\b", model or "")
+    return float(m.group(1)) if m else None
+
+
+def capability(model):
+    if model in MODEL_PROFILES:
+        return MODEL_PROFILES[model][1]
+    size = model_size(model)
+    return min(1.0, size / 9) if size else 0.5
+
+
+def band_of(score):
+    return next(name for limit, name in BANDS if score < limit)
+
+
+def complexity(prompt, subject, language, fact_hit=False):
+    """(score in 0..1, features) for a prompt"""
+    words = normalize_prompt(prompt).split()
+    if len(words) <= 4 and GREETINGS.intersection(words):
+        return 0.05, {"greeting": True}
+    lowered = prompt.lower()
+    features = {
+        "length": min(len(words), 60) / 60 * 0.3,
+        "subject": SUBJECT_WEIGHTS.get(subject, 0.1),
+        "language": LANGUAGE_WEIGHTS.get(language, 0.1),
+        # Formulas, or a word problem with several quantities
+        "math": 0.2 if MATH.search(lowered) or len(NUMBER.findall(lowered)) >= 2 else 0.0,
+        "reasoning": 0.15 if REASONING.search(lowered) else 0.0,
+        # The fact DB seeds the answer, the model only has to explain it
+        "fact": -0.2 if fact_hit else 0.0,
+    }
+    return max(0.0, min(1.0, sum(features.values()))), features
+
+
+class Route:
+    """A routing decision: model, score, band, script ("indic"/"latin") and reason"""
+
+    def __init__(self, model, score, band, script, reason, features):
+        self.model = model
+        self.score = score
+        self.band = band
+        self.script = script
+        self.reason = reason
+        self.features = features
+
+
+class _Record:
+    def __init__(self):
+        self.turns = 0
+        self.latency = 0.0
+        self.checks = 0
+        self.failures = 0
+
+
+class ModelRouter:
+    """Routes prompts to models and learns from answered and checked turns"""
+
+    def __init__(self, path=None, fact_lookup=None):
+        self.conn = connect(path) if path else connect()
+        self.lock = threading.Lock()
+        self.fact_lookup = fact_lookup
+        self.stats = {"routed": 0, "explored": 0}
+        self.mix = {}   # model -> questions routed to it by this process
+        with self.lock:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS model_routes (
+                    model TEXT NOT NULL,
+                    band TEXT NOT NULL,
+                    script TEXT NOT NULL,
+                    turns INTEGER NOT NULL DEFAULT 0,
+                    latency REAL NOT NULL DEFAULT 0,
+                    checks INTEGER NOT NULL DEFAULT 0,
+                    failures INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (model, band, script)
+                )
+            """)
+            self.conn.commit()
+            self._records = {}
+            for row in self.conn.execute("SELECT * FROM model_routes"):
+                rec = self._records[(row["model"], row["band"], row["script"])] = _Record()
+                rec.turns, rec.latency, rec.checks, rec.failures = row["turns"], row["latency"], row["checks"], row["failures"]
+
+    def _trusted(self, model, score, band, script):
+        rec = self._records.get((model, band, script))
+        if rec and rec.checks >= MIN_CHECKS:
+            return rec.failures / rec.checks <= MAX_FAILURE_RATE
+        return score <= capability(model)
+
+    def _cost(self, model, band, script):
+        rec = self._records.get((model, band, script))
+        if rec and rec.turns >= MIN_TURNS:
+            return rec.latency / rec.turns
+        return (model_size(model) or 7.0) * PRIOR_SECONDS_PER_B
+
+    def route(self, prompt, subject, language, candidates):
+        """Route for a prompt among candidate models (e.g. the installed ones)"""
+        fact_hit = bool(self.fact_lookup and subject in ("Social Science", "General") and self.fact_lookup(prompt))
+        score, features = complexity(prompt, subject, language, fact_hit)
+        band = band_of(score)
+        script = "indic" if language in INDIC else "latin"
+        with self.lock:
+            trusted = [m for m in candidates if self._trusted(m, score, band, script)]
+            cost = {m: self._cost(m, band, script) for m in candidates}
+            untested = [
+                m for m in candidates
+                if m not in trusted and capability(m) >= score - EXPLORE_MARGIN
+                and self._records.get((m, band, script), _Record()).checks < MIN_CHECKS
+            ]
+        if not trusted:
+            model, reason = max(candidates, key=capability), "strongest"
+        else:
+            model, reason = min(trusted, key=cost.get), "fastest trusted"
+            cheaper = [m for m in untested if cost[m] < cost[model]]
+            if cheaper and random.random() < EXPLORE_RATE:
+                model, reason = min(cheaper, key=cost.get), "explore"
+                self.stats["explored"] += 1
+        self.stats["routed"] += 1
+        self.mix[model] = self.mix.get(model, 0) + 1
+        return Route(model, score, band, script, reason, features)
+
+    def _update(self, model, band, script, turns=0, latency=0.0, checks=0, failures=0):
+        with self.lock:
+            rec = self._records.setdefault((model, band, script), _Record())
+            rec.turns += turns
+            rec.latency += latency
+            rec.checks += checks
+            rec.failures += failures
+            self.conn.execute(
+                "INSERT INTO model_routes (model, band, script, turns, latency, checks, failures) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(model, band, script) DO UPDATE SET turns = ?, latency = ?, checks = ?, failures = ?",
+                (model, band, script, rec.turns, rec.latency, rec.checks, rec.failures,
+                 rec.turns, rec.latency, rec.checks, rec.failures),
+            )
+            self.conn.commit()
+
+    def record_turn(self, route, model, latency):
+        """A freshly generated answer and its latency, under the model that wrote it"""
+        self._update(model, route.band, route.script, turns=1, latency=latency)
+
+    def record_drift(self, route, model):
+        """An attempt aborted for leaving the language's script counts as a failed check of its model"""
+        self._update(model, route.band, route.script, checks=1, failures=1)
+
+    def record_check(self, route, model, corrected):
+        """The verifier's verdict on an answer"""
+        self._update(model, route.band, route.script, checks=1, failures=int(corrected))
+
+    def report(self):
+        """Rows of model, band, script, turns, mean latency and failure rate"""
+        with self.lock:
+            items = list(self._records.items())
+        return [
+            {
+                "model": model, "band": band, "script": script, "turns": rec.turns,
+                "latency": round(rec.latency / rec.turns, 2) if rec.turns else None,
+                "checks": rec.checks,
+                "failure_rate": round(rec.failures / rec.checks, 3) if rec.checks else None,
+            }
+            for (model, band, script), rec in sorted(items)
+        ]
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """Process-wide router using the fact DB for fact hits"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            from fact_store import get_fact_store
+            _router = ModelRouter(fact_lookup=get_fact_store().lookup)
+        return _router
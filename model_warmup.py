@@ -0,0 +1,113 @@
+# Model warm-up for SkillSling AI
+# Loading a 7-8B model takes seconds. When the student switches subject or
+# model we load the new one in the background right away, so the first
+# question after a switch doesn't pay for the load.
+
+import os
+import threading
+import time
+from backends import get_backends
+from ollama_client import KEEP_ALIVE, get_client
+
+# Extra models to keep resident for other subjects, in GB of model size.
+# 0 disables it; Ollama also caps residency with OLLAMA_MAX_LOADED_MODELS.
+PRELOAD_RAM_BUDGET_GB = float(os.environ.get("SKILLSLING_PRELOAD_RAM_GB", "0"))
+LOADED_TTL = 5.0   # seconds a /api/ps result is reused
+
+_lock = threading.Lock()
+_state = {}        # model -> {"status": "loading"|"ready"|"error", "seconds": float, "error": str}
+_loaded = (0.0, frozenset())   # replaced under _lock, never changed in place, so callers may iterate it
+_preload_started = False
+
+
+def loaded_models():
+    """Models the backends currently have in memory (cached for LOADED_TTL)"""
+    global _loaded
+    checked, models = _loaded
+    if time.time() - checked < LOADED_TTL:
+        return models
+    try:
+        models = frozenset(get_backends().loaded_models())
+    except Exception:
+        models = frozenset()
+    with _lock:
+        _loaded = (time.time(), models)
+    return models
+
+
+def _load(model):
+    global _loaded
+    start = time.time()
+    loaded = False
+    try:
+        get_backends().warm_up(model, keep_alive=KEEP_ALIVE)
+        entry = {"status": "ready", "seconds": time.time() - start}
+        loaded = True
+    except Exception as e:
+        entry = {"status": "error", "seconds": time.time() - start, "error": str(e)}
+    with _lock:
+        _state[model] = entry
+        if loaded:
+            _loaded = (_loaded[0], _loaded[1] | {model})
+
+
+def warm_up(model, wait=False):
+    """Start loading a model in the background unless it is loading or loaded"""
+    if model in loaded_models():
+        return
+    with _lock:
+        if _state.get(model, {}).get("status") == "loading":
+            return
+        _state[model] = {"status": "loading", "seconds": 0.0}
+    thread = threading.Thread(target=_load, args=(model,), name=f"warmup-{model}", daemon=True)
+    thread.start()
+    if wait:
+        thread.join()
+
+
+def model_status(model):
+    """"ready", "loading", "error" or "cold" """
+    with _lock:
+        entry = dict(_state.get(model, {}))
+    if entry.get("status") == "loading":
+        return "loading"
+    if model in loaded_models():
+        return "ready"
+    # Ready but since unloaded (keep_alive expired or evicted) counts as cold
+    return "error" if entry.get("status") == "error" else "cold"
+
+
+def last_load_seconds(model):
+    with _lock:
+        return _state.get(model, {}).get("seconds")
+
+
+def preload(models, budget_gb=PRELOAD_RAM_BUDGET_GB):
+    """Load models in order, one at a time, while their total size fits the budget.
+
+    Runs once per process; later calls are no-ops.
+    """
+    global _preload_started
+    with _lock:
+        if _preload_started or budget_gb <= 0:
+            return []
+        _preload_started = True
+    try:
+        sizes = {m.model: m.size for m in get_client().list().models}
+    except Exception:
+        return []
+    chosen, used = [], 0.0
+    # The budget is about Ollama's residency; other runtimes manage their own
+    for model in dict.fromkeys(m for m in models if get_backends().name_for(m) == "ollama"):
+        size_gb = sizes.get(model, 0) / 1e9
+        if model in sizes and used + size_gb <= budget_gb:
+            chosen.append(model)
+            used += size_gb
+
+    def run():
+        for model in chosen:
+            if model_status(model) != "ready":
+                warm_up(model, wait=True)
+
+    threading.Thread(target=run, name="warmup-preload", daemon=True).start()
+    return chosen
@@ -0,0 +1,59 @@
+# Shared Ollama client for SkillSling AI
+# One pooled HTTP client per host for the whole process (connections are
+# kept alive between turns), with configurable timeouts, a cached health
+# check and a keep_alive setting so models stay loaded between questions.
+
+import os
+import threading
+import time
+import httpx
+import ollama
+
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
+CONNECT_TIMEOUT = 3.0
+READ_TIMEOUT = 300.0        # long answers on CPU can take minutes
+MAX_CONNECTIONS = 32
+KEEPALIVE_EXPIRY = 120.0    # seconds an idle HTTP connection is kept open
+KEEP_ALIVE = os.environ.get("SKILLSLING_KEEP_ALIVE", "30m")  # how long Ollama keeps a model loaded
+HEALTH_TTL = 10.0           # seconds a health check result is reused
+
+_clients = {}
+_clients_lock = threading.Lock()
+_health = {}   # host -> (checked_at, ok, models)
+
+
+def get_client(host=OLLAMA_HOST):
+    """Process-wide pooled client for a host"""
+    with _clients_lock:
+        client = _clients.get(host)
+        if client is None:
+            client = ollama.Client(
+                host=host,
+                timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_CONNECTIONS,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+            )
+            _clients[host] = client
+        return client
+
+
+def health(host=OLLAMA_HOST, ttl=HEALTH_TTL):
+    """(ok, model_names), re-checked at most once every ttl seconds"""
+    cached = _health.get(host)
+    now = time.time()
+    if cached and now - cached[0] < ttl:
+        return cached[1], cached[2]
+    try:
+        models = [m.model for m in get_client(host).list().models]
+        ok = True
+    except Exception:
+        models, ok = [], False
+    _health[host] = (now, ok, models)
+    return ok, models
+
+
+def is_healthy(host=OLLAMA_HOST, ttl=HEALTH_TTL):
+    return health(host, ttl)[0]
@@ -0,0 +1,85 @@
+import os
+import streamlit as st
+from datetime import datetime, timedelta
+from chat_history import get_history_store
+from metrics import latency_report, stage_breakdown
+from model_router import get_router
+from request_scheduler import get_scheduler
+from response_cache import get_response_cache
+from script_guard import get_drift_log
+from verification import get_verifier
+
+# Set SKILLSLING_ADMIN_PASSWORD to keep students out; without one the page
+# stays closed unless SKILLSLING_ADMIN_OPEN=1 (e.g. a single-user laptop)
+ADMIN_PASSWORD = os.environ.get("SKILLSLING_ADMIN_PASSWORD")
+ADMIN_OPEN = os.environ.get("SKILLSLING_ADMIN_OPEN", "0") == "1"
+
+WINDOWS = {
+    "Last hour": timedelta(hours=1),
+    "Last 24 hours": timedelta(days=1),
+    "Last 7 days": timedelta(days=7),
+    "All time": None,
+}
+GROUPS = {
+    "Model & subject": ("model", "subject"),
+    "Model": ("model",),
+    "Subject": ("subject",),
+    "Language": ("language",),
+}
+
+st.set_page_config(page_title="SkillSling • Admin", page_icon="📊", layout="wide")
+st.title("📊 Performance Dashboard")
+
+if ADMIN_PASSWORD:
+    if st.text_input("Admin password", type="password") != ADMIN_PASSWORD:
+        st.stop()
+elif not ADMIN_OPEN:
+    st.warning("The dashboard is closed. Set SKILLSLING_ADMIN_PASSWORD, or SKILLSLING_ADMIN_OPEN=1 to open it without one.")
+    st.stop()
+
+col1, col2 = st.columns(2)
+window = col1.selectbox("Window", list(WINDOWS), index=1)
+group = col2.selectbox("Group by", list(GROUPS))
+since = (datetime.now() - WINDOWS[window]).isoformat() if WINDOWS[window] else None
+
+history = get_history_store()
+report = history.read(lambda conn: latency_report(conn, since, GROUPS[group]))
+
+st.subheader("Latency per group (seconds)")
+if report:
+    st.dataframe(report, use_container_width=True, hide_index=True)
+else:
+    st.info("No answered questions in this window yet.")
+
+st.subheader("Where the time goes (mean seconds per turn)")
+stages = history.read(lambda conn: stage_breakdown(conn, since))
+if stages:
+    st.bar_chart({"seconds": stages})
+
+st.subheader("Language drift (answers restarted for leaving the language's script)")
+drift = get_drift_log().rates()
+if drift:
+    st.dataframe(drift, use_container_width=True, hide_index=True)
+else:
+    st.info("No guarded answers yet.")
+
+st.subheader("Model routing (per model and question band)")
+routes = get_router().report()
+if routes:
+    st.dataframe(routes, use_container_width=True, hide_index=True)
+else:
+    st.info("No automatically routed answers yet.")
+
+st.subheader("Live (this server process)")
+queue = get_scheduler().stats()
+cache = get_response_cache()
+verifier = get_verifier()
+c1, c2, c3, c4 = st.columns(4)
+c1.metric("Answering now", queue["in_flight"])
+c2.metric("Waiting in queue", queue["queued"])
+c3.metric("Queue wait p95", f"{queue['interactive_wait_p95']:.1f}s")
+c4.metric("Answer cache hit rate", f"{cache.hit_rate:.0%}")
+st.caption(
+    f"Verification: {verifier.stats['verified']} checked • {verifier.stats['corrected']} corrected • "
+    f"{verifier.stats['cancelled']} cancelled • {verifier.stats['preempted']} pre-empted"
+)
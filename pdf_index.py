@@ -0,0 +1,348 @@
+# PDF indexing for SkillSling AI
+# Builds FAISS indexes for uploaded notes and keeps them on disk under data/,
+# keyed by the PDF's content hash + embedding model + chunking parameters,
+# so a document that was indexed once loads in milliseconds next time.
+# New documents are ingested page by page: pages are read lazily, split and
+# embedded in a generator pipeline, and vectors are added to the store as
+# they arrive so early chapters are searchable while the rest is indexing.
+# faiss, pypdf and langchain are imported on first use, so importing this
+# module (for start_indexing or the constants) costs nothing at app startup.
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from backends import get_backends
+from db import DATA_DIR
+from ollama_client import KEEP_ALIVE
+
+INDEX_CACHE_DIR = os.path.join(DATA_DIR, "faiss_cache")
+INDEX_CACHE_MAX_BYTES = 512 * 1024 * 1024  # oldest indexes are evicted above this
+CHUNK_SIZE = 600
+CHUNK_OVERLAP = 120
+
+# Embeddings use a small dedicated model instead of the chat model.
+# Pull it once with: ollama pull nomic-embed-text
+EMBEDDING_MODEL = "nomic-embed-text"
+EMBED_BATCH_SIZE = 32   # chunks per /api/embed request
+EMBED_WORKERS = 4       # concurrent requests (pair with OLLAMA_NUM_PARALLEL)
+
+# Exact flat search is fastest for normal notes. For large corpora (whole
+# textbooks, many PDFs) switch to an approximate index: "hnsw" or "ivf".
+FAISS_INDEX_TYPE = "flat"
+ANN_MIN_VECTORS = 2000  # below this an ANN index isn't worth it
+HNSW_M = 32
+HNSW_EF_SEARCH = 64
+IVF_NPROBE = 8
+
+
+def index_cache_key(pdf_bytes, embed_model, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """Cache key: content hash of the PDF plus everything that changes the vectors"""
+    digest = hashlib.sha256(pdf_bytes).hexdigest()
+    params = f"{digest}|{embed_model}|{chunk_size}|{chunk_overlap}"
+    return hashlib.sha256(params.encode("utf-8")).hexdigest()[:32]
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def tune_index(index):
+    """Apply search-time parameters, which aren't reliably restored from disk"""
+    import faiss
+    if isinstance(index, faiss.IndexHNSW):
+        faiss.ParameterSpace().set_index_parameter(index, "efSearch", HNSW_EF_SEARCH)
+    elif isinstance(index, faiss.IndexIVF):
+        faiss.ParameterSpace().set_index_parameter(index, "nprobe", IVF_NPROBE)
+    return index
+
+
+def build_ann_index(flat_index, kind=FAISS_INDEX_TYPE):
+    """Rebuild a flat index as HNSW/IVF with the same vectors in the same order.
+
+    Returns the flat index unchanged if kind is "flat" or there are too few
+    vectors. Order is preserved so the docstore id mapping stays valid.
+    """
+    n = flat_index.ntotal
+    if kind == "flat" or n < ANN_MIN_VECTORS:
+        return flat_index
+    import faiss
+    vectors = flat_index.reconstruct_n(0, n)
+    dim = vectors.shape[1]
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+    elif kind == "ivf":
+        nlist = max(16, int(4 * n ** 0.5))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist)
+        index.train(vectors)
+    else:
+        raise ValueError(f"Unknown FAISS_INDEX_TYPE: {kind}")
+    index.add(vectors)
+    return tune_index(index)
+
+
+def load_cached_index(key, embeddings):
+    """Load a cached index, or None. Returns (store, meta)."""
+    path = os.path.join(INDEX_CACHE_DIR, key)
+    if not os.path.exists(os.path.join(path, "index.faiss")):
+        return None, None
+    from langchain_community.vectorstores import FAISS
+    try:
+        # Only indexes we wrote ourselves live here, so the pickle is trusted
+        store = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+        tune_index(store.index)
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except Exception:
+        shutil.rmtree(path, ignore_errors=True)
+        return None, None
+    # Directory mtime doubles as the LRU "last used" timestamp
+    os.utime(path, None)
+    return store, meta
+
+
+def save_index(key, store, meta):
+    """Write an index to the cache atomically, then enforce the size bound"""
+    os.makedirs(INDEX_CACHE_DIR, exist_ok=True)
+    final = os.path.join(INDEX_CACHE_DIR, key)
+    tmp = tempfile.mkdtemp(prefix=f".{key}-", dir=INDEX_CACHE_DIR)
+    try:
+        store.save_local(tmp)
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        shutil.rmtree(final, ignore_errors=True)
+        os.replace(tmp, final)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    evict_index_cache(keep=key)
+
+
+def evict_index_cache(max_bytes=INDEX_CACHE_MAX_BYTES, keep=None):
+    """Drop least-recently-used indexes until the cache fits in max_bytes"""
+    if not os.path.isdir(INDEX_CACHE_DIR):
+        return
+    entries = []
+    for name in os.listdir(INDEX_CACHE_DIR):
+        path = os.path.join(INDEX_CACHE_DIR, name)
+        if name.startswith(".") or not os.path.isdir(path):
+            continue
+        entries.append((os.path.getmtime(path), _dir_size(path), name, path))
+    total = sum(e[1] for e in entries)
+    for _, size, name, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if name == keep:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+def embed_texts(texts, embed_model=EMBEDDING_MODEL, client=None):
+    """Embed one batch of texts on the embedding model's backend"""
+    client = client or get_backends()
+    return client.embed(model=embed_model, input=texts, keep_alive=KEEP_ALIVE)["embeddings"]
+
+
+def iter_pdf_chunks(path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """Yield (page_number, chunks) one page at a time without loading the whole book"""
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    for page_no, page in enumerate(PyPDFLoader(path).lazy_load(), start=1):
+        yield page_no, [c for c in splitter.split_documents([page]) if c.page_content.strip()]
+
+
+def iter_batches(pages, batch_size=EMBED_BATCH_SIZE):
+    """Regroup per-page chunks into embedding batches; yields (pages_read, batch)"""
+    batch, page_no = [], 0
+    for page_no, chunks in pages:
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) == batch_size:
+                yield page_no, batch
+                batch = []
+    if batch:
+        yield page_no, batch
+
+
+def query_embeddings(embed_model=EMBEDDING_MODEL):
+    """LangChain embeddings for queries against a store, served by the model's backend"""
+    from langchain_core.embeddings import Embeddings
+
+    class BackendEmbeddings(Embeddings):
+        def embed_documents(self, texts):
+            return embed_texts(texts, embed_model)
+
+        def embed_query(self, text):
+            return embed_texts([text], embed_model)[0]
+
+    return BackendEmbeddings()
+
+
+class GrowingIndex:
+    """FAISS store that can be searched while an indexing job is still adding to it"""
+
+    def __init__(self, embed_model=EMBEDDING_MODEL):
+        self.embeddings = query_embeddings(embed_model)
+        self.store = None
+        self.lock = threading.Lock()
+
+    def add(self, chunks, vectors):
+        from langchain_community.vectorstores import FAISS
+        text_embeddings = [(c.page_content, v) for c, v in zip(chunks, vectors)]
+        metadatas = [c.metadata for c in chunks]
+        with self.lock:
+            if self.store is None:
+                self.store = FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas)
+            else:
+                self.store.add_embeddings(text_embeddings, metadatas=metadatas)
+
+    def optimize(self, kind=FAISS_INDEX_TYPE):
+        """Swap in an ANN index once ingestion is complete"""
+        with self.lock:
+            if self.store is not None:
+                self.store.index = build_ann_index(self.store.index, kind)
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        # Embed outside the lock so searching never stalls ingestion
+        if self.store is None:
+            return []
+        vector = self.embeddings.embed_query(query)
+        with self.lock:
+            return self.store.similarity_search_with_score_by_vector(vector, k=k, **kwargs)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+
+    def texts(self):
+        with self.lock:
+            return store_texts(self.store) if self.store is not None else []
+
+
+def store_texts(store):
+    """Text of every chunk in a FAISS store or GrowingIndex"""
+    if isinstance(store, GrowingIndex):
+        return store.texts()
+    return [doc.page_content for doc in list(store.docstore._dict.values())]
+
+
+class IndexingJob:
+    """Streams a PDF into a GrowingIndex, in a background thread or inline.
+
+    Pages are read lazily, split per page and regrouped into batches; at most
+    EMBED_WORKERS batches are in flight at once, so memory stays bounded by
+    the pipeline depth rather than the size of the book.
+    """
+
+    def __init__(self, pdf_bytes, embed_model=EMBEDDING_MODEL, batch_size=EMBED_BATCH_SIZE,
+                 workers=EMBED_WORKERS, progress=None):
+        self.key = index_cache_key(pdf_bytes, embed_model)
+        self.embed_model = embed_model
+        self.batch_size = batch_size
+        self.workers = max(1, workers)
+        self.progress = progress
+        self.index = GrowingIndex(embed_model)
+        self.total_pages = 0
+        self.pages_done = 0
+        self.chunks_done = 0
+        self.started = None
+        self.meta = None
+        self.error = None
+        self.done = threading.Event()
+        self._pdf_bytes = pdf_bytes
+        self._thread = None
+
+    @property
+    def chunks_per_sec(self):
+        elapsed = time.time() - self.started if self.started else 0
+        return round(self.chunks_done / elapsed, 1) if elapsed > 0 else 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _add(self, batch, pages_read, future):
+        self.index.add(batch, future.result())
+        self.chunks_done += len(batch)
+        self.pages_done = pages_read
+        if self.progress:
+            self.progress(self.pages_done, self.total_pages)
+
+    def run(self):
+        self.started = time.time()
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tf:
+            tf.write(self._pdf_bytes)
+            path = tf.name
+        self._pdf_bytes = None
+        client = get_backends()
+        try:
+            from pypdf import PdfReader
+            self.total_pages = len(PdfReader(path).pages)
+            in_flight = deque()
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for pages_read, batch in iter_batches(iter_pdf_chunks(path), self.batch_size):
+                    texts = [c.page_content for c in batch]
+                    in_flight.append((batch, pages_read, pool.submit(embed_texts, texts, self.embed_model, client)))
+                    # Backpressure: stop reading pages while the pool is saturated
+                    if len(in_flight) >= self.workers:
+                        self._add(*in_flight.popleft())
+                while in_flight:
+                    self._add(*in_flight.popleft())
+            if self.index.store is None:
+                raise ValueError("No extractable text in PDF (scanned images?)")
+            self.pages_done = self.total_pages
+            self.index.optimize()
+            elapsed = time.time() - self.started
+            self.meta = {
+                "key": self.key,
+                "embed_model": self.embed_model,
+                "pages": self.total_pages,
+                "chunks": self.chunks_done,
+                "embed_seconds": round(elapsed, 2),
+                "chunks_per_sec": self.chunks_per_sec,
+                "index_type": type(self.index.store.index).__name__,
+                "created": time.time(),
+            }
+            save_index(self.key, self.index.store, self.meta)
+        except Exception as e:
+            self.error = e
+        finally:
+            os.unlink(path)
+            self.done.set()
+        return self
+
+
+def start_indexing(pdf_bytes, embed_model=EMBEDDING_MODEL):
+    """Return (store, meta, job): a cached store and its meta, or a GrowingIndex fed by a started job"""
+    key = index_cache_key(pdf_bytes, embed_model)
+    store, meta = load_cached_index(key, query_embeddings(embed_model))
+    if store is not None:
+        return store, meta, None
+    job = IndexingJob(pdf_bytes, embed_model).start()
+    return job.index, None, job
+
+
+def load_or_build_index(pdf_bytes, embed_model=EMBEDDING_MODEL, progress=None):
+    """Blocking variant: return (store, meta, cached), using the on-disk cache when possible"""
+    key = index_cache_key(pdf_bytes, embed_model)
+    store, meta = load_cached_index(key, query_embeddings(embed_model))
+    if store is not None:
+        return store, meta, True
+    job = IndexingJob(pdf_bytes, embed_model, progress=progress).run()
+    if job.error:
+        raise job.error
+    return job.index.store, job.meta, False
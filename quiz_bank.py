@@ -0,0 +1,283 @@
+# Quiz bank for SkillSling AI
+# "Test My Knowledge" serves multiple-choice questions from a bank in
+# data/skillsling.db instead of generating a quiz per click. Banks are kept
+# per subject + language (+ uploaded PDF) and filled by one background
+# worker in small batches at BACKGROUND priority, so students' questions
+# always go first. Questions are deduplicated by a hash of their normalized
+# text; quizzes sample the least-served questions in random order and
+# shuffle the options each time.
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from backends import get_backends
+from db import connect
+from ollama_client import KEEP_ALIVE
+from pdf_index import store_texts
+from request_scheduler import BACKGROUND, get_scheduler
+from response_cache import normalize_prompt
+from tutor_pipeline import system_prompt
+
+QUIZ_BANK_SIZE = int(os.environ.get("SKILLSLING_QUIZ_BANK_SIZE", "40"))   # questions kept ready per bank
+QUIZ_BATCH = 5            # questions per generation request
+QUIZ_SIZE = 5             # questions per quiz
+MAX_EMPTY_BATCHES = 3     # give up on a bank after this many batches in a row add nothing
+MATERIAL_CHUNKS = 3       # PDF chunks a batch of questions is based on
+MATERIAL_CHARS = 2400
+AVOID_RECENT = 8          # existing questions shown to the model so it doesn't repeat them
+QUIZ_OPTIONS = {"temperature": 0.8, "top_p": 0.9, "num_predict": 1200}
+QUIZ_SESSION = "quiz-bank"   # scheduler fairness key for bank generation
+
+QUIZ_TOPICS = {
+    "General": ["Indian geography", "the human body", "famous Indian scientists", "environment and pollution",
+                "computers and the internet", "health and nutrition", "Indian festivals and culture", "space"],
+    "English": ["tenses", "parts of speech", "synonyms and antonyms", "active and passive voice",
+                "direct and indirect speech", "prepositions", "idioms", "reading comprehension of a short passage"],
+    "Social Science": ["the Indian freedom struggle", "the Mughal empire", "the Indian Constitution",
+                       "rivers and soils of India", "climate of India", "democracy and elections",
+                       "the French Revolution", "money and banking"],
+    "Mathematics": ["fractions and decimals", "linear equations", "quadratic equations", "triangles",
+                    "mensuration", "probability", "trigonometry", "arithmetic progressions"],
+    "Science": ["photosynthesis", "the cell", "acids, bases and salts", "light: reflection and refraction",
+                "electricity", "force and motion", "the periodic table", "heredity and evolution"],
+}
+
+QUIZ_PROMPT = """Write {n} multiple-choice quiz questions {about}. Each question has exactly 4 different options and one correct answer. Write the questions, options and explanations in {language}.
+Reply with ONLY a JSON array and nothing else:
+[{{"question": "...", "options": ["...", "...", "...", "..."], "answer": 0, "explanation": "one short sentence"}}]
+"answer" is the index (0-3) of the correct option.{avoid}{material}"""
+
+
+def question_id(subject, language, source, question):
+    raw = "\x1f".join([subject, language, source, normalize_prompt(question)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _answer_index(answer, options):
+    if isinstance(answer, bool):
+        return None
+    if isinstance(answer, int):
+        return answer
+    text = str(answer).strip()
+    if text.isdigit():
+        return int(text)
+    if len(text) == 1 and text.upper() in "ABCD":
+        return "ABCD".index(text.upper())
+    return options.index(text) if text in options else None
+
+
+def parse_questions(text):
+    """Well-formed questions from a model reply; malformed items are dropped"""
+    start, end = text.find("["), text.rfind("]")
+    if start < 0 or end <= start:
+        return []
+    try:
+        items = json.loads(text[start:end + 1])
+    except ValueError:
+        return []
+    questions = []
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        question = str(item.get("question") or "").strip()
+        options = item.get("options")
+        if not question or not isinstance(options, list) or len(options) != 4:
+            continue
+        options = [str(o).strip() for o in options]
+        answer = _answer_index(item.get("answer"), options)
+        if answer is None or not 0 <= answer < 4 or not all(options) or len(set(options)) < 4:
+            continue
+        questions.append({
+            "question": question,
+            "options": options,
+            "answer": answer,
+            "explanation": str(item.get("explanation") or "").strip(),
+        })
+    return questions
+
+
+class QuizBank:
+    """Question banks in SQLite plus the background worker that fills them"""
+
+    def __init__(self, path=None, client=None, scheduler=None, bank_size=QUIZ_BANK_SIZE):
+        self.conn = connect(path) if path else connect()
+        self.lock = threading.Lock()
+        self.client = client or get_backends()
+        self.scheduler = scheduler or get_scheduler()
+        self.bank_size = bank_size
+        self._jobs = deque()
+        self._pending = set()   # banks with a batch queued or running
+        self._cond = threading.Condition()
+        self.stats = {"batches": 0, "added": 0, "duplicates": 0, "rejected": 0, "errors": 0}
+        with self.lock:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS quiz_bank (
+                    id TEXT PRIMARY KEY,
+                    subject TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    source TEXT NOT NULL DEFAULT '',
+                    question TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    answer INTEGER NOT NULL,
+                    explanation TEXT,
+                    model TEXT,
+                    created REAL NOT NULL,
+                    served INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_quiz_bank_bank ON quiz_bank(subject, language, source, served);
+            """)
+            self.conn.commit()
+        threading.Thread(target=self._run, name="quiz-bank", daemon=True).start()
+
+    def count(self, subject, language, source=""):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM quiz_bank WHERE subject = ? AND language = ? AND source = ?",
+                (subject, language, source),
+            ).fetchone()[0]
+
+    def filling(self, subject, language, source=""):
+        with self._cond:
+            return (subject, language, source) in self._pending
+
+    def ensure(self, subject, language, model, source="", store=None):
+        """Fill a bank in the background until it holds bank_size questions.
+
+        source is "" for the subject-wide bank or a PDF index key, in which
+        case store (the PDF's vector store) provides the material.
+        """
+        bank = (subject, language, source)
+        with self._cond:
+            if bank in self._pending:
+                return
+        if self.count(*bank) >= self.bank_size:
+            return
+        with self._cond:
+            if bank not in self._pending:
+                self._pending.add(bank)
+                self._jobs.append((bank, model, store, 0))
+                self._cond.notify()
+
+    def sample(self, subject, language, source="", n=QUIZ_SIZE, exclude=()):
+        """Up to n least-served questions in random order, options shuffled.
+
+        Each question is a dict with id, question, options, answer (index
+        into options) and explanation; exclude holds ids already shown.
+        """
+        exclude = list(exclude)[-500:]
+        marks = ",".join("?" * len(exclude))
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, question, options, answer, explanation FROM quiz_bank "
+                f"WHERE subject = ? AND language = ? AND source = ? AND id NOT IN ({marks}) "
+                "ORDER BY served, RANDOM() LIMIT ?",
+                (subject, language, source, *exclude, n),
+            ).fetchall()
+            self.conn.executemany("UPDATE quiz_bank SET served = served + 1 WHERE id = ?", [(r["id"],) for r in rows])
+            self.conn.commit()
+        quiz = []
+        for row in rows:
+            options = json.loads(row["options"])
+            order = random.sample(range(len(options)), len(options))
+            quiz.append({
+                "id": row["id"],
+                "question": row["question"],
+                "options": [options[i] for i in order],
+                "answer": order.index(row["answer"]),
+                "explanation": row["explanation"] or "",
+            })
+        return quiz
+
+    def add(self, subject, language, source, questions, model=None):
+        """Store questions, skipping ones already in the bank; returns how many were new"""
+        now = time.time()
+        added = 0
+        with self.lock:
+            for q in questions:
+                cur = self.conn.execute(
+                    "INSERT OR IGNORE INTO quiz_bank (id, subject, language, source, question, options, answer, "
+                    "explanation, model, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (question_id(subject, language, source, q["question"]), subject, language, source, q["question"],
+                     json.dumps(q["options"], ensure_ascii=False), q["answer"], q["explanation"], model, now),
+                )
+                added += cur.rowcount
+            self.conn.commit()
+        self.stats["added"] += added
+        self.stats["duplicates"] += len(questions) - added
+        return added
+
+    def _recent_questions(self, subject, language, source, n=AVOID_RECENT):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT question FROM quiz_bank WHERE subject = ? AND language = ? AND source = ? "
+                "ORDER BY created DESC LIMIT ?",
+                (subject, language, source, n),
+            ).fetchall()
+        return [r["question"] for r in rows]
+
+    def _prompt(self, subject, language, source, store):
+        if store is not None:
+            chunks = store_texts(store)
+            if not chunks:
+                return None
+            material = "\n\n".join(random.sample(chunks, min(MATERIAL_CHUNKS, len(chunks))))[:MATERIAL_CHARS]
+            about, material = "based only on the student's notes below", f"\n\nNotes:\n{material}"
+        else:
+            topic = random.choice(QUIZ_TOPICS.get(subject, QUIZ_TOPICS["General"]))
+            about, material = f"for a Class 6-12 {subject} student about {topic}", ""
+        recent = self._recent_questions(subject, language, source)
+        avoid = "\nDo not repeat these questions:\n" + "\n".join(f"- {q}" for q in recent) if recent else ""
+        return QUIZ_PROMPT.format(n=QUIZ_BATCH, about=about, language=language, avoid=avoid, material=material)
+
+    def _generate(self, bank, model, store):
+        subject, language, source = bank
+        prompt = self._prompt(subject, language, source, store)
+        if prompt is None:
+            return 0
+        messages = [
+            {"role": "system", "content": system_prompt(language, subject)},
+            {"role": "user", "content": prompt},
+        ]
+        with self.scheduler.slot(QUIZ_SESSION, model, BACKGROUND):
+            response = self.client.chat(model=model, messages=messages, options=QUIZ_OPTIONS, keep_alive=KEEP_ALIVE)
+        questions = parse_questions(response["message"]["content"])
+        self.stats["rejected"] += max(0, QUIZ_BATCH - len(questions))
+        return self.add(subject, language, source, questions, model)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._jobs:
+                    self._cond.wait()
+                bank, model, store, empty = self._jobs.popleft()
+            try:
+                added = self._generate(bank, model, store)
+            except Exception as e:
+                print(f"Quiz bank error: {e}")
+                self.stats["errors"] += 1
+                added = 0
+            self.stats["batches"] += 1
+            empty = 0 if added else empty + 1
+            with self._cond:
+                # Requeue at the back so several banks fill side by side
+                if empty < MAX_EMPTY_BATCHES and self.count(*bank) < self.bank_size:
+                    self._jobs.append((bank, model, store, empty))
+                else:
+                    self._pending.discard(bank)
+
+
+_bank = None
+_bank_lock = threading.Lock()
+
+
+def get_quiz_bank():
+    """Process-wide quiz bank; its worker starts with it"""
+    global _bank
+    with _bank_lock:
+        if _bank is None:
+            _bank = QuizBank()
+        return _bank
@@ -0,0 +1,133 @@
+# Request scheduler for SkillSling AI
+# Every Streamlit session in the process submits its Ollama generations
+# through one scheduler, so a lab full of students shares the backend fairly:
+#   - at most MAX_IN_FLIGHT_PER_MODEL generations run per model
+#   - interactive questions always go before background jobs (verification, quiz)
+#   - within a priority, the session served least recently goes next
+# Waiters get their queue position, and wait times are kept for metrics.
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+MAX_IN_FLIGHT_PER_MODEL = int(os.environ.get("SKILLSLING_MAX_IN_FLIGHT", "2"))  # match OLLAMA_NUM_PARALLEL
+POSITION_POLL = 0.5      # seconds between queue-position callbacks
+WAIT_SAMPLES = 1000      # recent waits kept per priority for percentiles
+
+
+class _Ticket:
+    def __init__(self, session_id, model, priority, seq):
+        self.session_id = session_id
+        self.model = model
+        self.priority = priority
+        self.seq = seq
+        self.queued_at = time.time()
+        self.wait = 0.0
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class RequestScheduler:
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT_PER_MODEL):
+        self.max_in_flight = max(1, max_in_flight)
+        self._cond = threading.Condition()
+        self._waiting = {}       # model -> [tickets]
+        self._in_flight = {}     # model -> count
+        self._last_served = {}   # session_id -> time of last grant
+        self._seq = 0
+        self._waits = {p: deque(maxlen=WAIT_SAMPLES) for p in PRIORITY_NAMES}
+
+    def _order(self, ticket):
+        return (ticket.priority, self._last_served.get(ticket.session_id, 0.0), ticket.seq)
+
+    def _position(self, ticket):
+        """Number of requests ahead of this one for the same model"""
+        mine = self._order(ticket)
+        return sum(1 for t in self._waiting.get(ticket.model, []) if self._order(t) < mine)
+
+    def _grantable(self, ticket):
+        return self._in_flight.get(ticket.model, 0) < self.max_in_flight and self._position(ticket) == 0
+
+    @contextmanager
+    def slot(self, session_id, model, priority=INTERACTIVE, on_wait=None):
+        """Hold one generation slot for a model.
+
+        on_wait(position) is called from the waiting thread, outside the
+        scheduler lock, while the request is queued. Yields the ticket, whose
+        .wait is the time spent queued.
+        """
+        with self._cond:
+            self._seq += 1
+            ticket = _Ticket(session_id, model, priority, self._seq)
+            self._waiting.setdefault(model, []).append(ticket)
+            self._cond.notify_all()
+        try:
+            while True:
+                with self._cond:
+                    if self._grantable(ticket):
+                        self._waiting[model].remove(ticket)
+                        self._in_flight[model] = self._in_flight.get(model, 0) + 1
+                        self._last_served[session_id] = time.time()
+                        ticket.wait = time.time() - ticket.queued_at
+                        self._waits[priority].append(ticket.wait)
+                        break
+                    position = self._position(ticket) + self._in_flight.get(model, 0)
+                    if on_wait is None:
+                        self._cond.wait()
+                        continue
+                    self._cond.wait(POSITION_POLL)
+                on_wait(position)
+        except BaseException:
+            with self._cond:
+                if ticket in self._waiting.get(model, []):
+                    self._waiting[model].remove(ticket)
+                    self._cond.notify_all()
+            raise
+        try:
+            yield ticket
+        finally:
+            with self._cond:
+                self._in_flight[model] -= 1
+                self._cond.notify_all()
+
+    def has_waiting(self, model, priority=INTERACTIVE):
+        """Whether a request of this priority (or better) is queued for a model"""
+        with self._cond:
+            return any(t.priority <= priority for t in self._waiting.get(model, []))
+
+    def stats(self):
+        with self._cond:
+            stats = {
+                "queued": sum(len(v) for v in self._waiting.values()),
+                "in_flight": sum(self._in_flight.values()),
+            }
+            for priority, name in PRIORITY_NAMES.items():
+                waits = list(self._waits[priority])
+                stats[f"{name}_wait_p50"] = percentile(waits, 50)
+                stats[f"{name}_wait_p95"] = percentile(waits, 95)
+            return stats
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Process-wide scheduler shared by every session"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
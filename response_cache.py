@@ -0,0 +1,216 @@
+# Response cache for SkillSling AI
+# Classrooms ask the same questions many times a day. Answers are stored in
+# data/skillsling.db keyed by (model, language, subject, normalized prompt);
+# near-duplicate wording can optionally be matched by embedding similarity.
+# Embeddings barely see numbers or operators ("2x + 3 = 7" vs "2x - 3 = 9"),
+# so maths prompts only ever hit exactly, and a near-duplicate must mention
+# the same numbers.
+
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from functools import lru_cache
+import numpy as np
+from backends import get_backends
+from db import connect
+from ollama_client import KEEP_ALIVE
+from pdf_index import EMBEDDING_MODEL
+
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+CACHE_MAX_ENTRIES = 5000
+SEMANTIC_CACHE = True
+SEMANTIC_THRESHOLD = 0.93   # cosine similarity needed for a near-duplicate hit
+EXACT_ONLY_SUBJECTS = {"Mathematics"}
+MATH_TOKENS = re.compile(
+    r"[=+*/^×÷√∫<>%]|\d\s*-|-\s*\d|\b(?:plus|minus|times|divided|multiplied|squared?|cubed?|roots?|"
+    r"integra(?:te|l|tion)|derivative|differentiate|solve|factori[sz]e|simplify|expand|limit)\b"
+)
+NUMBERS = re.compile(r"\d+")
+
+# Short prompts that lean on the previous turn ("explain it again")
+# can't be answered from a cache keyed only on the prompt
+FOLLOWUP_WORDS = {"it", "this", "that", "these", "those", "more", "again", "above",
+                  "previous", "continue", "aur", "isko", "iska", "phir"}
+
+
+def normalize_prompt(prompt):
+    """Lowercase, NFKC, drop punctuation/symbols and collapse whitespace"""
+    text = unicodedata.normalize("NFKC", prompt).lower()
+    text = "".join(ch if unicodedata.category(ch)[0] in "LMN" else " " for ch in text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def is_standalone(prompt, has_history):
+    """Whether an answer can be reused regardless of the conversation so far"""
+    words = normalize_prompt(prompt).split()
+    if not words:
+        return False
+    if not has_history:
+        return True
+    return not (len(words) <= 6 and FOLLOWUP_WORDS.intersection(words))
+
+
+def semantic_eligible(subject, prompt):
+    """Whether a near-duplicate answer could stand in for this prompt's answer"""
+    return subject not in EXACT_ONLY_SUBJECTS and not MATH_TOKENS.search(unicodedata.normalize("NFKC", prompt).lower())
+
+
+def replay_stream(answer, piece_size=24):
+    """Yield a cached answer as ollama-style chunks so it renders like a live stream"""
+    for i in range(0, len(answer), piece_size):
+        yield {"message": {"content": answer[i:i + piece_size]}}
+
+
+@lru_cache(maxsize=512)
+def _embed(text):
+    vector = np.asarray(get_backends().embed(model=EMBEDDING_MODEL, input=text, keep_alive=KEEP_ALIVE)["embeddings"][0], dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class ResponseCache:
+    """Persistent answer cache with TTL + LRU eviction and hit-rate counters"""
+
+    def __init__(self, path=None, semantic=SEMANTIC_CACHE):
+        self.conn = connect(path) if path else connect()
+        self.lock = threading.Lock()
+        self.semantic = semantic
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+        # bucket -> (keys, matrix of unit embeddings); rebuilt lazily after writes
+        self._vectors = {}
+        with self.lock:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    prompt TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    embedding BLOB,
+                    created REAL NOT NULL,
+                    last_hit REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_response_cache_bucket ON response_cache(model, language, subject);
+                CREATE INDEX IF NOT EXISTS idx_response_cache_last_hit ON response_cache(last_hit);
+            """)
+            self.conn.commit()
+
+    @staticmethod
+    def make_key(model, language, subject, prompt):
+        raw = "\x1f".join([model, language, subject, normalize_prompt(prompt)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @property
+    def hit_rate(self):
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def _touch(self, key):
+        self.conn.execute("UPDATE response_cache SET hits = hits + 1, last_hit = ? WHERE key = ?", (time.time(), key))
+        self.conn.commit()
+
+    def _bucket_vectors(self, bucket):
+        if bucket not in self._vectors:
+            rows = self.conn.execute(
+                "SELECT key, embedding FROM response_cache WHERE model = ? AND language = ? AND subject = ? "
+                "AND embedding IS NOT NULL AND created > ?",
+                (*bucket, time.time() - CACHE_TTL_SECONDS),
+            ).fetchall()
+            keys = [r["key"] for r in rows]
+            matrix = np.vstack([np.frombuffer(r["embedding"], dtype=np.float32) for r in rows]) if rows else None
+            self._vectors[bucket] = (keys, matrix)
+        return self._vectors[bucket]
+
+    def get(self, model, language, subject, prompt):
+        """Return (answer, kind) where kind is "exact"/"semantic", or (None, None)"""
+        key = self.make_key(model, language, subject, prompt)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT answer FROM response_cache WHERE key = ? AND created > ?",
+                (key, time.time() - CACHE_TTL_SECONDS),
+            ).fetchone()
+            if row:
+                self._touch(key)
+                self.stats["exact_hits"] += 1
+                return row["answer"], "exact"
+        if self.semantic and semantic_eligible(subject, prompt):
+            answer = self._semantic_get((model, language, subject), prompt)
+            if answer is not None:
+                return answer, "semantic"
+        with self.lock:
+            self.stats["misses"] += 1
+        return None, None
+
+    def _semantic_get(self, bucket, prompt):
+        with self.lock:
+            keys, matrix = self._bucket_vectors(bucket)
+        if matrix is None:
+            return None
+        normalized = normalize_prompt(prompt)
+        try:
+            query = _embed(normalized)
+        except Exception:
+            return None
+        if matrix.shape[1] != query.shape[0]:
+            return None
+        scores = matrix @ query
+        best = int(np.argmax(scores))
+        if scores[best] < SEMANTIC_THRESHOLD:
+            return None
+        with self.lock:
+            # The bucket snapshot may be older than the TTL; expired rows are misses
+            row = self.conn.execute(
+                "SELECT prompt, answer FROM response_cache WHERE key = ? AND created > ?",
+                (keys[best], time.time() - CACHE_TTL_SECONDS),
+            ).fetchone()
+            if row is None or NUMBERS.findall(row["prompt"]) != NUMBERS.findall(normalized):
+                return None
+            self._touch(keys[best])
+            self.stats["semantic_hits"] += 1
+            return row["answer"]
+
+    def put(self, model, language, subject, prompt, answer):
+        if not answer.strip():
+            return
+        key = self.make_key(model, language, subject, prompt)
+        embedding = None
+        if self.semantic and semantic_eligible(subject, prompt):
+            try:
+                embedding = _embed(normalize_prompt(prompt)).tobytes()
+            except Exception:
+                pass
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, model, language, subject, prompt, answer, embedding, created, last_hit, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, model, language, subject, normalize_prompt(prompt), answer, embedding, now, now),
+            )
+            self._evict(now)
+            self.conn.commit()
+            self._vectors.pop((model, language, subject), None)
+
+    def _evict(self, now):
+        self.conn.execute("DELETE FROM response_cache WHERE created <= ?", (now - CACHE_TTL_SECONDS,))
+        self.conn.execute(
+            "DELETE FROM response_cache WHERE key IN (SELECT key FROM response_cache ORDER BY last_hit DESC LIMIT -1 OFFSET ?)",
+            (CACHE_MAX_ENTRIES,),
+        )
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Process-wide response cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
@@ -0,0 +1,57 @@
+# Retrieval stage for SkillSling AI
+# Looks up the most relevant chunks of the student's uploaded notes for a
+# prompt and packs them into the student's message under a token budget.
+
+import time
+
+RETRIEVAL_TOP_K = 4
+RETRIEVAL_TOKEN_BUDGET = 900   # max tokens of notes injected per turn
+CHARS_PER_TOKEN = 4            # rough estimate, good enough for budgeting
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def format_context(docs, token_budget=RETRIEVAL_TOKEN_BUDGET):
+    """Join retrieved chunks, best first, until the token budget is spent"""
+    parts, used = [], 0
+    for doc in docs:
+        page = doc.metadata.get("page")
+        label = f"[p.{page + 1}]" if isinstance(page, int) else "[notes]"
+        text = doc.page_content.strip()
+        cost = estimate_tokens(text)
+        if used + cost > token_budget:
+            remaining = (token_budget - used) * CHARS_PER_TOKEN
+            if remaining < 200:
+                break
+            text = text[:remaining].rsplit(" ", 1)[0] + " …"
+            cost = estimate_tokens(text)
+        parts.append(f"{label} {text}")
+        used += cost
+    return "\n\n".join(parts)
+
+
+def retrieve_context(store, query, k=RETRIEVAL_TOP_K, token_budget=RETRIEVAL_TOKEN_BUDGET):
+    """Search the notes for a prompt. Returns (context_text, latency_seconds)."""
+    if store is None:
+        return "", 0.0
+    start = time.time()
+    try:
+        hits = store.similarity_search_with_score(query, k=k)
+    except Exception as e:
+        print(f"Retrieval error: {e}")
+        return "", time.time() - start
+    context = format_context([doc for doc, _ in hits], token_budget)
+    return context, time.time() - start
+
+
+def context_block(context):
+    """Preamble for the student's message carrying the retrieved notes"""
+    if not context:
+        return ""
+    return (
+        "Use these excerpts from the student's uploaded notes when they are relevant. "
+        "Prefer them over general knowledge and mention the page when you use them.\n"
+        f"--- NOTES ---\n{context}\n--- END NOTES ---"
+    )
@@ -0,0 +1,222 @@
+# Script guard for SkillSling AI
+# Small models asked for Hindi/Tamil/Telugu sometimes drift into English
+# (or the other way round), which used to show only after a full answer.
+# The guard classifies the letters of the first streamed chunks by Unicode
+# script; the answer is held back until it has seen MIN_LETTERS letters,
+# and a drifting stream is closed right there and restarted, first with a
+# stronger language instruction, then on a fallback model if one is already
+# loaded. The last attempt is never aborted. Checks and drifts are counted
+# per model and language in data/skillsling.db for the admin dashboard.
+
+import os
+import re
+import threading
+import time
+import unicodedata
+from db import connect
+
+# Expected script per answer language (Hinglish is Roman script only)
+EXPECTED_SCRIPTS = {
+    "Hindi": "Devanagari",
+    "Tamil": "Tamil",
+    "Telugu": "Telugu",
+    "English": "Latin",
+    "Hinglish": "Latin",
+}
+SCRIPT_RANGES = [
+    ("ऀ", "ॿ", "Devanagari"),
+    ("஀", "௿", "Tamil"),
+    ("ఀ", "౿", "Telugu"),
+    ("A", "Z", "Latin"),
+    ("a", "z", "Latin"),
+    ("À", "ɏ", "Latin"),
+]
+MIN_LETTERS = 40          # letters seen before judging (a few dozen tokens)
+MAX_HOLD_CHARS = 400      # give up judging (and release the text) after this much output
+DRIFT_SHARE = 0.5         # drift when less than this share of letters is in the expected script
+# Formulas, LaTeX commands and code are written in Latin whatever the language
+IGNORED = re.compile(r"\$[^$]*\$?|\\[a-zA-Z]+|`[^`]*`?|\b[a-zA-Z]\b")
+DRIFT_FALLBACK_MODEL = os.environ.get("SKILLSLING_DRIFT_FALLBACK", "llama3.1:8b")
+
+RETRY_INSTRUCTIONS = {
+    "Hindi": "IMPORTANT: Write the whole answer in Hindi using Devanagari script only. Do not answer in English.",
+    "Tamil": "IMPORTANT: Write the whole answer in Tamil script only. Do not answer in English.",
+    "Telugu": "IMPORTANT: Write the whole answer in Telugu script only. Do not answer in English.",
+    "English": "IMPORTANT: Write the whole answer in English only.",
+    "Hinglish": "IMPORTANT: Write the whole answer in Hinglish using Roman (English) letters only, no Devanagari.",
+}
+
+
+def script_of(ch):
+    for low, high, script in SCRIPT_RANGES:
+        if low <= ch <= high:
+            return script
+    return None
+
+
+def script_counts(text):
+    """Letters (and combining vowel signs) per script, ignoring maths and code"""
+    counts = {}
+    for ch in IGNORED.sub(" ", text):
+        script = script_of(ch)
+        if script and unicodedata.category(ch)[0] in "LM":
+            counts[script] = counts.get(script, 0) + 1
+    return counts
+
+
+class ScriptGuard:
+    """Judges the opening of a streamed answer; feed() returns True once it drifted"""
+
+    def __init__(self, language, min_letters=MIN_LETTERS, max_hold=MAX_HOLD_CHARS):
+        self.expected = EXPECTED_SCRIPTS.get(language)
+        self.min_letters = min_letters
+        self.max_hold = max_hold
+        self.text = ""
+        self.share = None
+        self.drifted = False
+        self.decided = self.expected is None
+
+    def feed(self, text):
+        if self.decided:
+            return self.drifted
+        self.text += text
+        counts = script_counts(self.text)
+        letters = sum(counts.values())
+        if letters >= self.min_letters:
+            self.share = counts.get(self.expected, 0) / letters
+            self.drifted = self.share < DRIFT_SHARE
+            self.decided = True
+        elif len(self.text) >= self.max_hold:
+            self.decided = True
+        return self.drifted
+
+
+def stronger_messages(messages, language):
+    """messages with a firmer language instruction after the last user message.
+
+    Appended at the end so the prompt prefix (and the backend's KV cache)
+    stays the same.
+    """
+    instruction = RETRY_INSTRUCTIONS.get(language)
+    if not instruction:
+        return messages
+    msgs = [dict(m) for m in messages]
+    for m in reversed(msgs):
+        if m["role"] == "user":
+            m["content"] = f"{m['content']}\n\n{instruction}"
+            break
+    return msgs
+
+
+class GuardedGeneration:
+    """Streams an answer, restarting it when the output drifts off-script.
+
+    start(model, messages) opens a chat stream and stream_text(stream)
+    yields its text. fallback() is asked for another model when the
+    stronger instruction didn't help (None to skip). After iteration:
+    model (the one that answered), retries and drifts [(model, share)].
+    """
+
+    def __init__(self, start, stream_text, model, messages, language, fallback=None, log=None):
+        self.start = start
+        self.stream_text = stream_text
+        self.model = model
+        self.messages = messages
+        self.language = language
+        self.fallback = fallback
+        self.log = log
+        self.retries = 0
+        self.drifts = []
+
+    def __iter__(self):
+        attempts = [(self.model, self.messages)]
+        stronger = stronger_messages(self.messages, self.language)
+        if EXPECTED_SCRIPTS.get(self.language) and stronger is not self.messages:
+            attempts.append((self.model, stronger))
+        i = 0
+        while i < len(attempts):
+            if i == 1 and self.fallback:
+                # Only looked up once the stronger instruction is needed
+                other = self.fallback()
+                if other and other != self.model:
+                    attempts.append((other, stronger))
+            model, messages = attempts[i]
+            last = i == len(attempts) - 1
+            guard = ScriptGuard(self.language)
+            stream = self.start(model, messages)
+            texts = self.stream_text(stream)
+            held = []
+            aborted = False
+            for text in texts:
+                if not guard.decided:
+                    guard.feed(text)
+                    if guard.drifted and not last:
+                        texts.close()
+                        getattr(stream, "close", lambda: None)()
+                        aborted = True
+                        break
+                    if not guard.decided:
+                        held.append(text)
+                        continue
+                    text = "".join(held) + text
+                    held = []
+                yield text
+            if held and not aborted:
+                yield "".join(held)
+            if guard.share is not None and self.log is not None:
+                self.log.record(model, self.language, guard.drifted)
+            self.model = model
+            if not aborted:
+                return
+            self.drifts.append((model, round(guard.share, 2)))
+            self.retries += 1
+            i += 1
+
+
+class DriftLog:
+    """Checked / drifted counts per model and language"""
+
+    def __init__(self, path=None):
+        self.conn = connect(path) if path else connect()
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS script_drift (
+                    model TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    checks INTEGER NOT NULL DEFAULT 0,
+                    drifts INTEGER NOT NULL DEFAULT 0,
+                    updated REAL NOT NULL,
+                    PRIMARY KEY (model, language)
+                )
+            """)
+            self.conn.commit()
+
+    def record(self, model, language, drifted):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO script_drift (model, language, checks, drifts, updated) VALUES (?, ?, 1, ?, ?) "
+                "ON CONFLICT(model, language) DO UPDATE SET checks = checks + 1, drifts = drifts + excluded.drifts, "
+                "updated = excluded.updated",
+                (model, language, int(drifted), time.time()),
+            )
+            self.conn.commit()
+
+    def rates(self):
+        """Rows of model, language, checks, drifts and drift_rate, worst first"""
+        with self.lock:
+            rows = self.conn.execute("SELECT model, language, checks, drifts FROM script_drift").fetchall()
+        report = [dict(r, drift_rate=round(r["drifts"] / r["checks"], 3) if r["checks"] else 0.0) for r in rows]
+        return sorted(report, key=lambda r: (-r["drift_rate"], r["model"], r["language"]))
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_drift_log():
+    global _log
+    with _log_lock:
+        if _log is None:
+            _log = DriftLog()
+        return _log
@@ -0,0 +1,60 @@
+# Throttled rendering of streamed answers for SkillSling AI
+# Re-rendering the whole Markdown answer on every token means thousands of
+# websocket messages of ever-growing text per answer, which phones in
+# particular can't keep up with. Chunks are collected in a list and the
+# placeholder is only redrawn every `interval` seconds or every `tokens`
+# chunks, whichever comes first; the cadence depends on the device class.
+
+import time
+
+# Device class -> (seconds between redraws, chunks between redraws)
+RENDER_PROFILES = {
+    "desktop": (0.05, 16),
+    "tablet": (0.10, 32),
+    "mobile": (0.15, 48),
+}
+DEFAULT_PROFILE = "desktop"
+CURSOR = "▌"
+
+
+def device_class(user_agent):
+    """Rough device class from a User-Agent header"""
+    ua = (user_agent or "").lower()
+    if "ipad" in ua or "tablet" in ua or ("android" in ua and "mobile" not in ua):
+        return "tablet"
+    if any(word in ua for word in ("mobi", "iphone", "android", "opera mini")):
+        return "mobile"
+    return "desktop"
+
+
+class StreamRenderer:
+    """Buffers streamed text and redraws a placeholder on a time/size cadence"""
+
+    def __init__(self, placeholder, profile=DEFAULT_PROFILE):
+        self.placeholder = placeholder
+        self.interval, self.max_pending = RENDER_PROFILES.get(profile, RENDER_PROFILES[DEFAULT_PROFILE])
+        self.parts = []
+        self.pending = 0
+        self.renders = 0
+        self._last = 0.0
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    def write(self, chunk):
+        self.parts.append(chunk)
+        self.pending += 1
+        now = time.perf_counter()
+        if self.pending >= self.max_pending or now - self._last >= self.interval:
+            self._render(self.text + CURSOR, now)
+
+    def finish(self, text=None):
+        """Draw the final answer (or text, e.g. a corrected one) without the cursor"""
+        self._render(self.text if text is None else text, time.perf_counter())
+
+    def _render(self, markdown, now):
+        self.placeholder.markdown(markdown)
+        self.pending = 0
+        self.renders += 1
+        self._last = now
@@ -0,0 +1,264 @@
+# Tutor engine for SkillSling AI
+# The whole answer pipeline – retrieval, prompt building within the history
+# token budget, response cache, hybrid engines, fair scheduling, streaming,
+# verification and history – behind one object that is built once per
+# process. Frontends (the Streamlit app, benchmark.py, other clients) only
+# ask and render:
+#
+#   turn = get_engine().ask(session_id, prompt, history, "Hindi", "Science", model)
+#   for text in turn:
+#       show(text)
+#   turn.answer, turn.metrics
+
+import threading
+import uuid
+from contextlib import nullcontext
+from backends import get_backends
+from chat_history import get_history_store
+from context_window import ContextWindow
+from math_engine import MATH_DIRECT_ANSWER
+from metrics import TurnTimer
+from model_router import get_router
+from model_warmup import loaded_models
+from ollama_client import KEEP_ALIVE
+from request_scheduler import INTERACTIVE, RequestScheduler, get_scheduler
+from response_cache import get_response_cache, is_standalone, replay_stream
+from retrieval import context_block, retrieve_context
+from script_guard import DRIFT_FALLBACK_MODEL, GuardedGeneration, get_drift_log
+from tutor_pipeline import GENERATION_OPTIONS, build_messages, elaboration_messages, hybrid_answer, stream_text, timed_text
+from verification import get_verifier
+
+VERIFIED_KEYS_MAX = 1000   # cache keys / routes remembered for answers awaiting verification
+
+
+class Turn:
+    """One answer being generated; iterate it for text pieces.
+
+    After iteration: answer, metrics (TurnTimer.summary()), cache_kind,
+    cache_key (None unless reusable), queue_wait, context, retrieval_latency,
+    hybrid (a sympy/fact result seeded the answer), direct (the math
+    engine answered without the LLM), answered_by (the model that wrote the
+    answer), retries (restarts after the answer drifted off-script) and
+    drifts ([(model, share)] of the aborted attempts).
+    route is the router's decision when the model was picked automatically.
+    """
+
+    def __init__(self, engine, session_id, prompt, history, language, subject, model, vector_store=None,
+                 on_wait=None, direct_math=False, route=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.engine = engine
+        self.session_id = session_id
+        self.prompt = prompt
+        self.history = list(history) + [{"role": "user", "content": prompt}]
+        self.language = language
+        self.subject = subject
+        self.model = model
+        self.vector_store = vector_store
+        self.on_wait = on_wait
+        self.direct_math = direct_math
+        self.answer = ""
+        self.metrics = None
+        self.cache_kind = None
+        self.cache_key = None
+        self.queue_wait = 0.0
+        self.context = ""
+        self.retrieval_latency = 0.0
+        self.hybrid = False
+        self.direct = False
+        self.answered_by = model
+        self.retries = 0
+        self.drifts = []
+        self.route = route
+        self._started = False
+
+    def __iter__(self):
+        if self._started:
+            raise RuntimeError("a turn can only be streamed once")
+        self._started = True
+        return self._run()
+
+    def _run(self):
+        engine = self.engine
+        timer = TurnTimer(self.model)
+
+        # Retrieval – search the uploaded notes before building the prompt
+        with timer.stage("retrieval"):
+            self.context, self.retrieval_latency = retrieve_context(self.vector_store, self.prompt)
+
+        with timer.stage("prompt"):
+            summary, recent = engine.window.fit(self.session_id, self.history, self.model)
+            msgs = build_messages(recent, self.language, self.subject, summary, context_block(self.context))
+
+        # Answers grounded in uploaded notes or leaning on earlier turns aren't reusable
+        cached_answer = None
+        key = (self.model, self.language, self.subject, self.prompt)
+        if engine.cache is not None and not self.context and is_standalone(self.prompt, len(self.history) > 1):
+            self.cache_key = key
+            with timer.stage("cache"):
+                cached_answer, self.cache_kind = engine.cache.get(*key)
+
+        seed = full_answer = None
+        if cached_answer is None:
+            with timer.stage("engines"):
+                seed, full_answer = hybrid_answer(self.prompt, self.subject)
+        self.hybrid = seed is not None
+        self.direct = full_answer is not None and self.direct_math
+        ready_answer = cached_answer if cached_answer is not None else (full_answer if self.direct else None)
+        if seed is not None and ready_answer is None:
+            msgs = elaboration_messages(msgs, seed)
+
+        # Live generations queue for a fair share of the shared backend
+        # (interactive before background work); replays don't need a slot
+        if ready_answer is None:
+            slot = engine.scheduler.slot(self.session_id, self.model, INTERACTIVE, on_wait=self.on_wait)
+        else:
+            slot = nullcontext()
+        parts = []
+        with slot as ticket:
+            self.queue_wait = ticket.wait if ticket else 0.0
+            timer.add("queue", self.queue_wait)
+            if ready_answer is None:
+                # Restarted within the slot if it drifts out of the language's script
+                texts = generation = GuardedGeneration(
+                    lambda model, messages: engine.client.chat(
+                        model=model,
+                        messages=messages,
+                        stream=True,
+                        options=GENERATION_OPTIONS,
+                        keep_alive=KEEP_ALIVE
+                    ),
+                    lambda stream: stream_text(stream, timer),
+                    self.model, msgs, self.language, engine.drift_fallback, engine.drift_log,
+                )
+            else:
+                texts = stream_text(replay_stream(ready_answer), timer)
+            for text in timed_text(texts, timer):
+                parts.append(text)
+                yield text
+        if ready_answer is None:
+            self.answered_by, self.retries, self.drifts = generation.model, generation.retries, generation.drifts
+        self.answer = "".join(parts)
+        self.metrics = timer.summary()
+        engine._finish(self, fresh=ready_answer is None)
+
+
+class TutorEngine:
+    """Process-wide answer pipeline; cache, verifier and history are optional.
+
+    client is anything with the Ollama client's chat() – by default the
+    configured Backends, which route each model to its runtime.
+    """
+
+    def __init__(self, client=None, scheduler=None, cache=None, verifier=None, history=None, drift_log=None,
+                 router=None):
+        self.client = client or get_backends()
+        self.scheduler = scheduler or RequestScheduler()
+        self.window = ContextWindow(self.client, self.scheduler)
+        self.cache = cache
+        self.verifier = verifier
+        self.history = history
+        self.drift_log = drift_log
+        self.router = router
+        self._verified_keys = {}   # turn id -> cache key, so corrections reach the cache
+        self._routes = {}          # turn id -> route, so checks reach the router's records
+        self._lock = threading.Lock()
+        if verifier is not None and router is not None:
+            verifier.add_listener(self._checked)
+
+    def ask(self, session_id, prompt, history, language, subject, model, vector_store=None, on_wait=None,
+            direct_math=None, auto_models=None):
+        """Start a turn; history is the conversation before this prompt.
+
+        on_wait(position) is called while the question waits for a slot.
+        direct_math answers solvable maths without the LLM (default
+        MATH_DIRECT_ANSWER). With auto_models (e.g. the installed models)
+        the router picks one of them by the question's complexity instead
+        of model. Nothing is generated until the Turn is iterated.
+        """
+        if direct_math is None:
+            direct_math = MATH_DIRECT_ANSWER
+        route = None
+        if auto_models and self.router is not None:
+            route = self.router.route(prompt, subject, language, auto_models)
+            model = route.model
+        # A newer question makes pending checks of older answers pointless
+        if self.verifier is not None:
+            self.verifier.cancel(session_id)
+        self._record(session_id, "user", prompt, None, language, subject, model)
+        return Turn(self, session_id, prompt, history, language, subject, model, vector_store, on_wait, direct_math,
+                    route)
+
+    def _finish(self, turn, fresh):
+        if fresh and turn.cache_key is not None:
+            self.cache.put(*turn.cache_key, turn.answer)
+        # Cached answers were checked when first generated and sympy/fact
+        # answers rest on a deterministic result
+        if fresh and turn.route is not None:
+            # Drifts count against the models that drifted, not the one that answered after the restart
+            for drifted, _ in turn.drifts:
+                self.router.record_drift(turn.route, drifted)
+            self.router.record_turn(turn.route, turn.answered_by, turn.metrics["latency"])
+        if fresh and not turn.hybrid and self.verifier is not None:
+            with self._lock:
+                if turn.cache_key is not None:
+                    self._verified_keys[turn.id] = turn.cache_key
+                if turn.route is not None:
+                    self._routes[turn.id] = turn.route
+                for pending in (self._verified_keys, self._routes):
+                    while len(pending) > VERIFIED_KEYS_MAX:
+                        pending.pop(next(iter(pending)))
+            self.verifier.submit(turn.session_id, turn.id, turn.answered_by, turn.answer)
+        self._record(turn.session_id, "assistant", turn.answer, turn.metrics["latency"],
+                     turn.language, turn.subject, turn.answered_by, turn.metrics, turn.id)
+
+    def _record(self, session_id, role, content, latency, language, subject, model, metrics=None, turn_id=None):
+        if self.history is not None:
+            self.history.record(session_id, role, content, latency, language, subject, model, metrics, turn_id)
+
+    def _checked(self, turn_id, model, corrected):
+        """Verifier listener: a routed answer's check counts towards its model's record"""
+        with self._lock:
+            route = self._routes.pop(turn_id, None)
+        if route is not None:
+            self.router.record_check(route, model, corrected)
+
+    def drift_fallback(self):
+        """Model to retry a drifting answer on, if it's already in memory (a cold load costs more than it saves)"""
+        return DRIFT_FALLBACK_MODEL if DRIFT_FALLBACK_MODEL in loaded_models() else None
+
+    def verifying(self, session_id):
+        return self.verifier is not None and self.verifier.pending(session_id)
+
+    def corrections(self, session_id):
+        """(turn_id, corrected answer) pairs from the verifier; the cache and history are updated too"""
+        if self.verifier is None:
+            return []
+        results = self.verifier.pop_results(session_id)
+        for turn_id, corrected in results:
+            with self._lock:
+                key = self._verified_keys.pop(turn_id, None)
+            if key is not None and self.cache is not None:
+                self.cache.put(*key, corrected)
+            if self.history is not None:
+                self.history.correct(session_id, turn_id, corrected)
+        return results
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Process-wide engine wired to the shared scheduler, cache, verifier and history"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = TutorEngine(
+                scheduler=get_scheduler(),
+                cache=get_response_cache(),
+                verifier=get_verifier(),
+                history=get_history_store(),
+                drift_log=get_drift_log(),
+                router=get_router(),
+            )
+        return _engine
@@ -0,0 +1,128 @@
+# Chat pipeline building blocks for SkillSling AI
+# Prompt assembly, the hybrid sympy/fact engines and the streaming loop,
+# kept free of Streamlit so they can be driven by the app, tests and
+# benchmarks alike. sympy is imported on the first Mathematics question
+# (see math_engine.py).
+
+import time
+import math_engine
+from fact_store import get_fact_store
+
+GENERATION_OPTIONS = {"temperature": 0.0, "top_p": 0.6, "top_k": 30, "repeat_penalty": 1.15, "num_predict": 1024}
+
+LANGUAGE_SYSTEM_PROMPTS = {
+    "Hindi": """You are a Hindi tutor. Answer ONLY in Hindi (Devanagari script). No English letters at all. Use simple language. Follow NCERT style.""",
+    "English": """You are a helpful tutor for Indian students. Answer ONLY in English. Use clear, simple words. Be accurate and encouraging. Follow NCERT guidelines.""",
+    "Hinglish": """You are a Hinglish tutor (Roman script only). Mix Hindi + English naturally. Keep it simple and friendly.""",
+    "Tamil": """நீங்கள் தமிழ் ஆசிரியர். தமிழில் மட்டுமே பதிலளிக்கவும். எளிய மொழியைப் பயன்படுத்தவும்.""",
+    "Telugu": """మీరు తెలుగు ఉపాధ్యాయులు. తెలుగులో మాత్రమే సమాధానం ఇవ్వండి. సులభమైన భాష వాడండి."""
+}
+
+# Depth instructions per subject
+DEPTH_INSTRUCTIONS = {
+    "General": """
+Always structure answers like a patient, expert tutor:
+1. Short friendly intro
+2. Numbered / bulleted main points
+3. Simple examples
+4. Key takeaway + encouragement
+""",
+    "Science": """
+Include:
+• Exact cellular location
+• Key enzymes with full names
+• Balanced chemical equations
+• ATP/NADPH/electron counts
+• Related concepts (photorespiration etc.)
+End with boxed key takeaway **\\boxed{Key Takeaway: ...}**
+""",
+    "Mathematics": """
+STRICT MATH MODE:
+1. Restate problem
+2. Main formula/theorem
+3. Step-by-step numbered solution
+4. Algebraic details
+5. Box final answer **\\boxed{answer}**
+6. Re-check / substitute
+7. Common mistakes to avoid
+"""
+}
+
+
+def system_prompt(language, subject):
+    base = LANGUAGE_SYSTEM_PROMPTS.get(language, LANGUAGE_SYSTEM_PROMPTS["English"])
+    if subject in DEPTH_INSTRUCTIONS:
+        base += DEPTH_INSTRUCTIONS[subject]
+    return base + f"\nCurrent subject focus: {subject}"
+
+
+def build_messages(recent, language, subject, summary="", notes_block=""):
+    """Chat messages for Ollama; recent ends with the new user prompt.
+
+    Everything that changes from turn to turn (summary, retrieved notes)
+    comes after the system prompt and language instruction, so that prefix
+    stays byte-identical across a session and Ollama can reuse its KV cache.
+    """
+    msgs = [
+        {"role": "system", "content": system_prompt(language, subject)},
+        {"role": "user", "content": f"From now on answer ONLY in {language} language."},
+    ]
+    if summary:
+        msgs.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+    for m in recent:
+        msgs.append({"role": m["role"], "content": m["content"]})
+    if notes_block:
+        msgs[-1] = {"role": "user", "content": f"{notes_block}\n\n{msgs[-1]['content']}"}
+    return msgs
+
+
+def hybrid_answer(prompt, subject):
+    """Deterministic fast paths (sympy, fact DB).
+
+    Returns (seed, full_answer): seed is a result for the LLM to elaborate
+    on, full_answer a complete answer that needs no LLM (maths only).
+    """
+    # 1. Mathematics – exact result from the math engine
+    if subject == "Mathematics":
+        result = math_engine.solve(prompt)
+        if result:
+            return result.seed(), result.markdown()
+
+    # 2. History / Social Science – fact DB first
+    if subject in ["Social Science", "General"]:
+        fact = get_fact_store().lookup(prompt, source="history")
+        if fact:
+            key, value = fact
+            return f"{key.title()} occurred in **{value}**.\n\nLet me explain in detail...", None
+
+    return None, None
+
+
+def elaboration_messages(msgs, seed_answer):
+    return msgs + [{"role": "user", "content": f"Elaborate on this fact/result in detail: {seed_answer}"}]
+
+
+def stream_text(stream, timer=None):
+    """Yield the text of an Ollama chat stream chunk by chunk, recording its counters"""
+    for chunk in stream:
+        if timer:
+            timer.observe(chunk)
+        if 'message' in chunk and chunk['message'].get('content'):
+            yield chunk['message']['content']
+
+
+def timed_text(texts, timer):
+    """Pass text through, timing first token and streaming on what the student sees.
+
+    Wraps the final text (e.g. a GuardedGeneration), so chunks held back or
+    thrown away with a drifted attempt don't count as the first token.
+    """
+    generation_start = time.perf_counter()
+    first_token = 0.0
+    for text in texts:
+        if timer.ttft is None:
+            timer.first_token()
+            first_token = time.perf_counter() - generation_start
+            timer.add("first_token", first_token)
+        yield text
+    timer.add("streaming", time.perf_counter() - generation_start - first_token)
@@ -0,0 +1,159 @@
+# Background answer verification for SkillSling AI
+# A second "strict checker" pass over each answer, run by a single worker
+# thread that yields to interactive generations, drops work that is no
+# longer wanted and hands corrections back for the session to apply.
+# Checks go through the shared request scheduler at BACKGROUND priority.
+
+import threading
+from collections import deque
+from backends import get_backends
+from ollama_client import KEEP_ALIVE
+from request_scheduler import BACKGROUND, INTERACTIVE, get_scheduler
+
+VERIFY_QUEUE_SIZE = 32   # oldest pending jobs are dropped beyond this
+VERIFY_OPTIONS = {"temperature": 0.0, "top_p": 0.6, "num_predict": 1024}
+CHECK_PROMPT = """Strict checker. If any error, output corrected answer. If correct, output exactly the same. No explanation.
+
+Answer:
+{answer}"""
+
+
+class _Job:
+    def __init__(self, session_id, turn_id, model, answer, generation):
+        self.session_id = session_id
+        self.turn_id = turn_id
+        self.model = model
+        self.answer = answer
+        self.generation = generation
+
+
+class VerificationScheduler:
+    """Bounded queue + one worker; student questions always go first"""
+
+    def __init__(self, maxsize=VERIFY_QUEUE_SIZE):
+        self.maxsize = maxsize
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._generation = {}   # session_id -> counter bumped by cancel()
+        self._results = {}      # session_id -> [(turn_id, corrected)]
+        self._running_session = None
+        self._listeners = []
+        self.stats = {"submitted": 0, "verified": 0, "corrected": 0, "cancelled": 0, "preempted": 0, "dropped": 0}
+        threading.Thread(target=self._run, name="verifier", daemon=True).start()
+
+    # ---- called from sessions ----
+
+    def submit(self, session_id, turn_id, model, answer):
+        with self._cond:
+            job = _Job(session_id, turn_id, model, answer, self._generation.get(session_id, 0))
+            if len(self._pending) >= self.maxsize:
+                self._pending.popleft()
+                self.stats["dropped"] += 1
+            self._pending.append(job)
+            self.stats["submitted"] += 1
+            self._cond.notify_all()
+
+    def cancel(self, session_id):
+        """Forget queued and running checks for a session (a newer question arrived)"""
+        with self._cond:
+            self._generation[session_id] = self._generation.get(session_id, 0) + 1
+            before = len(self._pending)
+            self._pending = deque(j for j in self._pending if j.session_id != session_id)
+            self.stats["cancelled"] += before - len(self._pending)
+
+    def pending(self, session_id):
+        with self._cond:
+            return any(j.session_id == session_id for j in self._pending) or self._running_session == session_id
+
+    def add_listener(self, fn):
+        """fn(turn_id, model, corrected) is called from the worker after every finished check"""
+        self._listeners.append(fn)
+
+    def pop_results(self, session_id):
+        """Corrections ready for a session as [(turn_id, corrected)]; safe to call from the script thread"""
+        with self._cond:
+            return self._results.pop(session_id, [])
+
+    # ---- worker ----
+
+    def _stale(self, job):
+        return self._generation.get(job.session_id, 0) != job.generation
+
+    def _should_stop(self, job):
+        with self._cond:
+            if self._stale(job):
+                return True
+        return get_scheduler().has_waiting(job.model, INTERACTIVE)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                job = self._pending.popleft()
+                if self._stale(job):
+                    self.stats["cancelled"] += 1
+                    continue
+                self._running_session = job.session_id
+            try:
+                corrected = self._verify(job)
+            except Exception as e:
+                print(f"Verification error: {e}")
+                corrected = None
+            with self._cond:
+                self._running_session = None
+                if corrected is _PREEMPTED:
+                    if self._stale(job):
+                        self.stats["cancelled"] += 1
+                    else:
+                        # Yielded to a student; retry once the backend is free
+                        self._pending.appendleft(job)
+                        self.stats["preempted"] += 1
+                    continue
+                self.stats["verified"] += 1
+                changed = bool(corrected) and corrected != job.answer.strip()
+                if changed and not self._stale(job):
+                    self.stats["corrected"] += 1
+                    self._results.setdefault(job.session_id, []).append((job.turn_id, corrected))
+            if corrected is not None:
+                for fn in self._listeners:
+                    try:
+                        fn(job.turn_id, job.model, changed)
+                    except Exception as e:
+                        print(f"Verification listener error: {e}")
+
+    def _verify(self, job):
+        with get_scheduler().slot(job.session_id, job.model, BACKGROUND):
+            if self._should_stop(job):
+                return _PREEMPTED
+            # Streamed so the check can be abandoned mid-way
+            stream = get_backends().chat(
+                model=job.model,
+                messages=[{"role": "user", "content": CHECK_PROMPT.format(answer=job.answer)}],
+                stream=True,
+                options=VERIFY_OPTIONS,
+                keep_alive=KEEP_ALIVE,
+            )
+            parts = []
+            for chunk in stream:
+                if self._should_stop(job):
+                    stream.close()
+                    return _PREEMPTED
+                parts.append(chunk["message"]["content"])
+            return "".join(parts).strip()
+
+
+_PREEMPTED = object()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_verifier():
+    """Process-wide verification scheduler"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = VerificationScheduler()
+        return _scheduler
@@ -1,26 +1,294 @@
-# Simple web search module for SkillSling AI
-# Uses free Tavily API
+# Offline knowledge search for SkillSling AI
+# web_search() used to call Tavily with an empty API key, so it always
+# failed. It now searches a local corpus (Wikipedia / NCERT text dumps)
+# through a BM25 index built ahead of time and opened with numpy memory
+# maps: nothing is read into RAM up front, and a query only touches the
+# postings of its own terms, so results come back in milliseconds with no
+# network. BM25 weights are computed at build time and each term's
+# postings are stored best-first, so very common terms are cut to their
+# top MAX_POSTINGS entries instead of being scanned in full.
+#
+#   python web_search.py build dumps/hiwiki/ ncert/*.txt    # .txt/.md files, JSON lines (WikiExtractor --json)
+#   python web_search.py search "quit india movement"
+#
+# Results have the shape Tavily returned: {"title", "url", "content", "score"}.
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+import numpy as np
+from db import DATA_DIR
+from fact_store import tokenize
+
+SEARCH_INDEX_DIR = os.environ.get("SKILLSLING_SEARCH_INDEX", os.path.join(DATA_DIR, "search_index"))
+PASSAGE_WORDS = 180      # documents are split into passages of about this many words
+K1 = 1.2
+B = 0.75
+MAX_POSTINGS = 50000     # best postings read per query term
+FLUSH_POSTINGS = 2_000_000   # postings buffered in Python lists during a build before packing into arrays
+TEXT_SUFFIXES = (".txt", ".md")
+JSON_SUFFIXES = (".jsonl", ".json")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on", "or", "that",
+    "the", "this", "to", "was", "were", "what", "which", "who", "with",
+    "का", "की", "के", "है", "में", "और", "को", "से", "पर", "भी", "था", "थे", "हैं", "एक", "यह", "क्या",
+}
+
+
+def term_hash(term):
+    """64-bit id of a term; the index stores ids, not strings"""
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def terms_of(text):
+    return [t for t in tokenize(text) if t not in STOPWORDS]
+
+
+# ==================== CORPUS ====================
+def iter_documents(paths):
+    """(title, url, text) from text files and JSON-lines dumps, directories walked recursively"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                yield from iter_documents(os.path.join(root, name) for name in sorted(files))
+            continue
+        name = os.path.basename(path)
+        with open(path, encoding="utf-8", errors="replace") as f:
+            first = f.read(1)
+            f.seek(0)
+            if name.endswith(TEXT_SUFFIXES):
+                title = os.path.splitext(name)[0].replace("_", " ").replace("-", " ")
+                yield title, "file://" + os.path.abspath(path), f.read()
+            elif name.endswith(JSON_SUFFIXES) or first == "{":
+                for line in f:
+                    try:
+                        doc = json.loads(line)
+                    except ValueError:
+                        continue
+                    text = doc.get("text") or doc.get("content") or doc.get("body") or ""
+                    if text.strip():
+                        yield doc.get("title") or "", doc.get("url") or "", text
+
+
+def iter_passages(documents, passage_words=PASSAGE_WORDS):
+    """Split documents into passages at paragraph boundaries (long paragraphs at word boundaries)"""
+    for title, url, text in documents:
+        words = []
+        for paragraph in text.split("\n"):
+            words += paragraph.split()
+            if len(words) >= passage_words:
+                while len(words) >= 2 * passage_words:
+                    yield title, url, " ".join(words[:passage_words])
+                    words = words[passage_words:]
+                yield title, url, " ".join(words)
+                words = []
+        if words:
+            yield title, url, " ".join(words)
+
+
+# ==================== BUILD ====================
+def build_index(paths, out_dir=SEARCH_INDEX_DIR, passage_words=PASSAGE_WORDS, k1=K1, b=B, progress=None):
+    """Index a corpus into out_dir (replaced atomically); returns the index meta"""
+    started = time.time()
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".search-index-", dir=parent)
+    try:
+        hashes = {}
+        packed = []   # (term ids, docs, tfs) arrays
+        terms, docs, tfs = [], [], []
+        lengths = []
+        offsets = [0]
+        with open(os.path.join(tmp, "docs.jsonl"), "wb") as store:
+            for title, url, text in iter_passages(iter_documents(paths), passage_words):
+                doc = len(lengths)
+                counts = Counter(terms_of(f"{title} {text}"))
+                lengths.append(sum(counts.values()))
+                for term, tf in counts.items():
+                    h = hashes.get(term)
+                    if h is None:
+                        h = hashes[term] = term_hash(term)
+                    terms.append(h)
+                    docs.append(doc)
+                    tfs.append(tf)
+                line = json.dumps({"title": title, "url": url, "text": text}, ensure_ascii=False).encode("utf-8") + b"\n"
+                store.write(line)
+                offsets.append(offsets[-1] + len(line))
+                if len(terms) >= FLUSH_POSTINGS:
+                    packed.append((np.array(terms, np.uint64), np.array(docs, np.uint32), np.array(tfs, np.uint32)))
+                    terms, docs, tfs = [], [], []
+                if progress and doc and doc % 10000 == 0:
+                    progress(doc)
+        packed.append((np.array(terms, np.uint64), np.array(docs, np.uint32), np.array(tfs, np.uint32)))
+        n_docs = len(lengths)
+        if not n_docs:
+            raise ValueError("no text found in the given files")
+        terms = np.concatenate([p[0] for p in packed])
+        docs = np.concatenate([p[1] for p in packed])
+        tfs = np.concatenate([p[2] for p in packed]).astype(np.float32)
+        del packed
+
+        # BM25 impact of every (term, passage) pair
+        lengths = np.array(lengths, np.float32)
+        avgdl = float(lengths.mean()) or 1.0
+        vocab, inverse, df = np.unique(terms, return_inverse=True, return_counts=True)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        impact = idf[inverse] * tfs * (k1 + 1) / (tfs + k1 * (1 - b + b * lengths[docs] / avgdl))
+        del tfs, terms
+        # Grouped by term, best postings first
+        order = np.lexsort((-impact, inverse))
+        starts = np.zeros(len(vocab) + 1, np.int64)
+        np.cumsum(df, out=starts[1:])
+
+        np.save(os.path.join(tmp, "terms.npy"), vocab)
+        np.save(os.path.join(tmp, "term_starts.npy"), starts)
+        np.save(os.path.join(tmp, "post_docs.npy"), docs[order])
+        np.save(os.path.join(tmp, "post_impact.npy"), impact[order].astype(np.float32))
+        np.save(os.path.join(tmp, "doc_offsets.npy"), np.array(offsets, np.int64))
+        meta = {
+            "passages": n_docs,
+            "terms": int(len(vocab)),
+            "postings": int(len(docs)),
+            "avgdl": round(avgdl, 2),
+            "k1": k1,
+            "b": b,
+            "passage_words": passage_words,
+            "sources": [os.path.abspath(p) for p in paths],
+            "build_seconds": round(time.time() - started, 1),
+            "created": time.time(),
+        }
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=1)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.replace(tmp, out_dir)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return meta
+
+
+# ==================== SEARCH ====================
+class SearchIndex:
+    """A built index, memory-mapped read-only; safe to share between threads"""
+
+    def __init__(self, path=SEARCH_INDEX_DIR):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        def load(name):
+            return np.load(os.path.join(path, name), mmap_mode="r")
+
+        self.terms = load("terms.npy")
+        self.term_starts = load("term_starts.npy")
+        self.post_docs = load("post_docs.npy")
+        self.post_impact = load("post_impact.npy")
+        self.doc_offsets = load("doc_offsets.npy")
+        with open(os.path.join(path, "docs.jsonl"), "rb") as f:
+            self.docs = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def passage(self, doc):
+        start, end = self.doc_offsets[doc], self.doc_offsets[doc + 1]
+        return json.loads(self.docs[start:end])
+
+    def search(self, query, max_results=3, max_postings=MAX_POSTINGS):
+        """Best passages for a query as [{"title", "url", "content", "score"}]"""
+        hashes = np.array(sorted({term_hash(t) for t in terms_of(query)}), np.uint64)
+        if not len(hashes) or not len(self.terms):
+            return []
+        idx = np.searchsorted(self.terms, hashes)
+        found = idx < len(self.terms)
+        found[found] = self.terms[idx[found]] == hashes[found]
+        idx = idx[found]
+        if not len(idx):
+            return []
+        docs, weights = [], []
+        for i in idx:
+            start = int(self.term_starts[i])
+            end = min(int(self.term_starts[i + 1]), start + max_postings)
+            docs.append(self.post_docs[start:end])
+            weights.append(self.post_impact[start:end])
+        docs, inverse = np.unique(np.concatenate(docs), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weights).astype(np.float64))
+        k = min(max_results, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        results = []
+        for i in top:
+            doc = self.passage(int(docs[i]))
+            results.append({"title": doc["title"], "url": doc["url"], "content": doc["text"], "score": round(float(scores[i]), 3)})
+        return results
+
+
+_index = None
+_index_lock = threading.Lock()
+_missing_reported = False
+
+
+def get_search_index():
+    """Process-wide index, or None until one is built"""
+    global _index, _missing_reported
+    with _index_lock:
+        if _index is None:
+            if not os.path.exists(os.path.join(SEARCH_INDEX_DIR, "meta.json")):
+                if not _missing_reported:
+                    print(f"Search: no index at {SEARCH_INDEX_DIR}, build one with `python web_search.py build <files>`")
+                    _missing_reported = True
+                return None
+            _index = SearchIndex(SEARCH_INDEX_DIR)
+        return _index
+
 
 def web_search(query, max_results=3):
-    """
-    Simple web search function using Tavily
-    Returns list of search results
-    """
+    """Search the local knowledge corpus; returns a list of result dicts ([] without an index)"""
     try:
-        from tavily import TavilyClient
-        
-        # You can get free API key from https://app.tavily.com/
-        # For now, we'll use a simple fallback
-        
-        client = TavilyClient(api_key="")
-        results = client.search(query=query, max_results=max_results)
-        
-        return results.get("results", [])
+        index = get_search_index()
+        return index.search(query, max_results) if index else []
     except Exception as e:
         print(f"Search error: {e}")
         return []
 
-# For testing without API key
+
 def web_search_fallback(query):
-    """Fallback when no API key"""
-    return []
+    """Kept for old callers; the local search needs no API key"""
+    return web_search(query)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the offline knowledge search index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_build = sub.add_parser("build", help="index .txt/.md files and JSON-lines dumps (files or directories)")
+    p_build.add_argument("paths", nargs="+")
+    p_build.add_argument("--out", default=SEARCH_INDEX_DIR)
+    p_build.add_argument("--passage-words", type=int, default=PASSAGE_WORDS)
+    p_search = sub.add_parser("search", help="query the index")
+    p_search.add_argument("query")
+    p_search.add_argument("-n", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        meta = build_index(args.paths, args.out, args.passage_words,
+                           progress=lambda n: print(f"  {n} passages...", file=sys.stderr))
+        print(f"Indexed {meta['passages']} passages, {meta['terms']} terms in {meta['build_seconds']}s -> {args.out}")
+    else:
+        index = get_search_index()
+        if index is None:
+            sys.exit(1)
+        started = time.perf_counter()
+        results = index.search(args.query, args.n)
+        elapsed = (time.perf_counter() - started) * 1000
+        for r in results:
+            print(f"[{r['score']:.2f}] {r['title']} {r['url']}\n    {r['content'][:200]}")
+        print(f"{len(results)} results in {elapsed:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()